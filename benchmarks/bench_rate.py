@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+@name:   Real Estate Rate Benchmark
+@author: Jack Kirby Cook
+
+"""
+
+import sys
+import timeit
+import numpy as np
+from scipy.interpolate import interp1d
+
+from realestate.economy import Rate
+
+__version__ = "1.0.0"
+__author__ = "Jack Kirby Cook"
+__all__ = ['LegacyRate', 'benchmark']
+__copyright__ = "Copyright 2020, Jack Kirby Cook"
+__license__ = ""
+
+
+_convertKeys = ['year', 'month', 'week']
+_convertMatrix = np.array([[1, 12, 52], [1/12, 1, 52/12], [1/52, 12/52, 1]]) 
+_convertindex = lambda key: _convertKeys.index(key)
+_convertfactor = lambda fromvalue, tovalue: _convertMatrix[_convertindex(fromvalue), _convertindex(tovalue)]
+_convertrate = lambda frombasis, tobasis, rate: pow((1 + rate), pow(_convertfactor(frombasis, tobasis), -1)) - 1
+_curve = lambda x, y, method, fill: interp1d(x, y, kind=method, bounds_error=False, fill_value=fill) 
+
+
+class LegacyRate(object):
+    def __init__(self, x, y, *args, basis, method='linear', **kwargs): 
+        self.__basis, self.__curve = basis, _curve(x, y, method, (np.average(y), np.average(y)))
+    def __call__(self, x, *args, units, **kwargs): return float(_convertrate(self.__basis, units, self.__curve(x)))
+
+
+def benchmark(function, number, repeat=5): return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def main(*args, size=1000, number=1000, **kwargs):
+    x, y = np.arange(2000, 2051), np.random.default_rng(0).uniform(0.01, 0.05, 51)
+    legacy, rate = LegacyRate(x, y, basis='year'), Rate(x, y, basis='year')
+    values = np.random.default_rng(1).uniform(1995, 2055, size)
+    assert np.allclose([legacy(value, units='month') for value in x], rate(x, units='month'), rtol=1e-12)
+    assert np.allclose([legacy(value, units='month') for value in values], rate(values, units='month'), rtol=1e-2)
+    timings = {
+        'scalar': (benchmark(lambda: legacy(2025.5, units='month'), number), benchmark(lambda: rate(2025.5, units='month'), number)),
+        'array[{}]'.format(size): (benchmark(lambda: [legacy(value, units='month') for value in values], max(number // size, 1)), benchmark(lambda: rate(values, units='month'), number))}
+    for key, (old, new) in timings.items():
+        print('Rate {}: interp1d {:.2f}us, Rate {:.2f}us, Speedup {:.1f}x'.format(key, old * 1e6, new * 1e6, old / new))
+
+
+if __name__ == '__main__': 
+    main(**{key:int(value) for key, value in (arg.split('=') for arg in sys.argv[1:])})
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+@name:   Real Estate Cache Objects
+@author: Jack Kirby Cook
+
+"""
+
+import numpy as np
+import pandas as pd
+from numbers import Number
+from contextlib import contextmanager
+from collections import OrderedDict as ODict
+
+__version__ = "1.0.0"
+__author__ = "Jack Kirby Cook"
+__all__ = ['InstanceKey', 'InstanceCache', 'ColumnTable', 'scopedcache']
+__copyright__ = "Copyright 2020, Jack Kirby Cook"
+__license__ = ""
+
+
+class InstanceKey(tuple):
+    def __repr__(self): return '{}{}'.format(self.__class__.__name__, tuple.__repr__(self))
+    def __new__(cls, items):
+        instance = super().__new__(cls, items)
+        instance.__hash = tuple.__hash__(instance)
+        return instance
+
+    def __hash__(self): return self.__hash
+    def __ne__(self, other): return not self.__eq__(other)
+    def __eq__(self, other): 
+        if self is other: return True
+        if isinstance(other, InstanceKey) and self.__hash != other.__hash: return False
+        return tuple.__eq__(self, other)
+    def __reduce__(self): return (self.__class__, (tuple(self),))
+
+
+_filldtype = lambda dtype: {'f':np.nan, 'i':0, 'u':0, 'b':False}.get(np.dtype(dtype).kind, None)
+_inferdtype = lambda value: np.dtype('float64') if isinstance(value, Number) and not isinstance(value, bool) else np.dtype('object')
+
+
+class ColumnTable(object):
+    __dtypes = {}
+    def __init_subclass__(cls, *args, dtypes={}, **kwargs): cls.__dtypes = {key:np.dtype(value) for key, value in dtypes.items()}
+
+    def __repr__(self): return '{}(size={}, columns={})'.format(self.__class__.__name__, len(self), list(self.__columns.keys()))
+    def __len__(self): return int(np.count_nonzero(self.__active[:self.__size]))
+    def __contains__(self, column): return column in self.__columns
+
+    @property
+    def columns(self): return list(self.__columns.keys())
+    @property
+    def active(self): return self.__active[:self.__size]
+
+    def __init__(self, capacity=64):
+        assert int(capacity) > 0
+        self.__capacity = int(capacity)
+        self.clear()
+
+    def clear(self):
+        self.__columns, self.__size = ODict(), 0
+        self.__active = np.zeros(self.__capacity, dtype=bool)
+        for column, dtype in self.__dtypes.items(): self.__columns[column] = np.full(self.__capacity, _filldtype(dtype), dtype=dtype)
+
+    def __create(self, column, value):
+        dtype = self.__dtypes.get(column, _inferdtype(value))
+        self.__columns[column] = np.full(len(self.__active), _filldtype(dtype), dtype=dtype)
+
+    def __grow(self):
+        capacity = 2 * len(self.__active)
+        self.__active = np.concatenate([self.__active, np.zeros(capacity - len(self.__active), dtype=bool)])
+        for column, values in self.__columns.items():
+            newvalues = np.full(capacity, _filldtype(values.dtype), dtype=values.dtype)
+            newvalues[:len(values)] = values
+            self.__columns[column] = newvalues
+
+    def append(self, **values):
+        if self.__size == len(self.__active): self.__grow()
+        row, self.__size = self.__size, self.__size + 1
+        return self.revive(row, **values)
+
+    def revive(self, row, **values):
+        for column, value in values.items():
+            if column not in self.__columns: self.__create(column, value)
+        for column, columnvalues in self.__columns.items(): columnvalues[row] = values.get(column, _filldtype(columnvalues.dtype))
+        self.__active[row] = True
+        return row
+
+    def release(self, row): self.__active[row] = False
+
+    def get(self, row, column): return self.__columns[column][row]
+    def set(self, row, column, value): self.__columns[column][row] = value
+    def add(self, row, column, value): self.__columns[column][row] += value
+    def __getitem__(self, column): return self.__columns[column][:self.__size]
+
+    def dataframe(self, columns=None):
+        columns = list(self.__columns.keys()) if columns is None else [column for column in columns if column in self.__columns]
+        active = self.__active[:self.__size]
+        if np.all(active): content = {column:self.__columns[column][:self.__size] for column in columns}
+        else: content = {column:self.__columns[column][:self.__size][active] for column in columns}
+        return pd.DataFrame(content, columns=columns, copy=False)
+
+
+class InstanceCache(object):
+    def __repr__(self): return '{}({})'.format(self.__class__.__name__, ', '.join(['='.join([key, str(value)]) for key, value in self.statistics.items()]))
+    def __len__(self): return len(self.__instances)
+    def __contains__(self, key): return key in self.__instances
+    def __iter__(self): return iter(self.__instances.values())
+
+    @property
+    def maxsize(self): return self.__maxsize
+    @property
+    def statistics(self): return dict(size=len(self), maxsize=self.__maxsize, hits=self.__hits, misses=self.__misses, evictions=self.__evictions, untabled=self.__untabled, ledger=len(self.__ledger), forfeited=self.__forfeited)
+    
+    @property
+    def table(self): return self.__table
+
+    def __init__(self, maxsize=None, ledgersize=None, table=ColumnTable):
+        assert maxsize is None or int(maxsize) > 0
+        assert ledgersize is None or int(ledgersize) >= 0
+        self.__maxsize = int(maxsize) if maxsize is not None else None
+        self.__ledgersize = int(ledgersize) if ledgersize is not None else self.__maxsize
+        self.__tabletype = table
+        self.clear()
+
+    def clear(self):
+        self.__instances, self.__ledger = ODict(), ODict()
+        self.__table = self.__tabletype()
+        self.__hits, self.__misses, self.__evictions = 0, 0, 0
+        self.__untabled, self.__forfeited = 0, 0
+
+    def values(self): return list(self.__instances.values())
+    def __getitem__(self, key):
+        try: instance = self.__instances[key]
+        except KeyError: 
+            self.__misses += 1
+            raise
+        self.__hits += 1
+        if self.__maxsize is not None: self.__instances.move_to_end(key)
+        return instance
+
+    def __setitem__(self, key, instance):
+        self.__instances[key] = instance
+        if self.__maxsize is None: return
+        self.__instances.move_to_end(key)
+        while len(self.__instances) > self.__maxsize:
+            evictedkey, evicted = self.__instances.popitem(last=False)
+            self.__ledger[evictedkey] = (evicted.count, evicted.row)
+            self.__ledger.move_to_end(evictedkey)
+            self.__table.release(evicted.row)
+            self.__untabled += evicted.count
+            self.__evictions += 1
+        while self.__ledgersize is not None and len(self.__ledger) > self.__ledgersize:
+            forfeitedkey, (forfeited, row) = self.__ledger.popitem(last=False)
+            self.__forfeited += forfeited
+
+    def restore(self, key, **values): 
+        count, row = self.__ledger.pop(key, (0, None))
+        self.__untabled -= count
+        if row is None: return self.__table.append(count=count, **values)
+        return self.__table.revive(row, count=count, **values)
+
+
+@contextmanager
+def scopedcache(cls, cache):
+    previous = cls.swapcache(cache)
+    try: yield cache
+    finally: cls.swapcache(previous)
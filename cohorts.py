@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+@name:   Real Estate Cohort Objects
+@author: Jack Kirby Cook
+
+"""
+
+import numpy as np
+from collections import namedtuple as ntuple
+
+from utilities.dispatchers import key_singledispatcher
+
+from realestate.households import Household
+from realestate.housing import Housing
+
+__version__ = "1.0.0"
+__author__ = "Jack Kirby Cook"
+__all__ = ['Household_Cohorts', 'Housing_Cohorts', 'CohortResult']
+__copyright__ = "Copyright 2020, Jack Kirby Cook"
+__license__ = ""
+
+
+_constant = lambda value: lambda *args, **kwargs: value
+_weightedmean = lambda values, weights: np.sum(values * weights) / np.sum(weights)
+_weightedstd = lambda values, weights: np.sqrt(_weightedmean(np.square(values - _weightedmean(values, weights)), weights))
+
+
+@key_singledispatcher
+def createedges(method, values, weights, bins): raise KeyError(method)
+@createedges.register('quantile')
+def createedges_quantile(values, weights, bins):
+    finite = np.isfinite(values)
+    values, weights = values[finite], weights[finite]
+    if not len(values): return np.array([])
+    order = np.argsort(values, kind='stable')
+    quantiles = np.cumsum(weights[order]) / np.sum(weights)
+    return np.unique(np.interp(np.linspace(0, 1, bins + 1)[1:-1], quantiles, values[order]))
+@createedges.register('grid')
+def createedges_grid(values, weights, bins):
+    values = values[np.isfinite(values)]
+    if not len(values): return np.array([])
+    return np.unique(np.linspace(np.min(values), np.max(values), bins + 1)[1:-1])
+
+
+def creategroups(codes):
+    _, assignments = np.unique(codes, axis=0, return_inverse=True)
+    return np.ravel(assignments)
+
+
+def createmedoids(assignments, distances):
+    order = np.lexsort((distances, assignments))
+    return order[np.concatenate([[0], np.flatnonzero(np.diff(assignments[order])) + 1])]
+
+
+class CohortResult(ntuple('CohortResult', 'representatives assignments errors')):
+    def __repr__(self): return '{}(items={}, cohorts={}, reduction={:.1f})'.format(self.__class__.__name__, self.items, self.cohorts, self.reduction)
+    def __str__(self): return '\n'.join(['Cohorts: {} -> {} ({:.1f}x)'.format(self.items, self.cohorts, self.reduction), *['{}: {:.4f}'.format(key, value) for key, value in self.errors.items()]])
+
+    @property
+    def items(self): return len(self.assignments)
+    @property
+    def cohorts(self): return len(self.representatives)
+    @property
+    def reduction(self): return self.items / max(self.cohorts, 1)
+
+
+class Cohorts(object):
+    def __init_subclass__(cls, *args, cohorttype, bins={}, **kwargs): cls.__cohorttype, cls.__defaults = cohorttype, dict(bins)
+    def __repr__(self): return '{}(bins={}, method={}, maxcohorts={})'.format(self.__class__.__name__, self.__bins, self.__method, self.__maxcohorts)
+    def __init__(self, *args, bins=None, method='quantile', maxcohorts=None, **kwargs): 
+        assert maxcohorts is None or int(maxcohorts) > 0
+        self.__bins = bins if bins is not None else dict(self.__defaults)
+        self.__method, self.__maxcohorts = method, maxcohorts
+
+    def bins(self, key): return self.__bins.get(key, 0) if isinstance(self.__bins, dict) else self.__bins
+
+    def __call__(self, items, *args, **kwargs):
+        items = list(items)
+        weights = np.array([item.count for item in items], dtype='float64')
+        features = self.features(items, *args, **kwargs)
+        lookup = {}
+        categories = np.array([lookup.setdefault(category, len(lookup)) for category in self.categories(items, *args, **kwargs)])
+        assignments = self.assign(features, weights, categories)
+        totals = np.bincount(assignments, weights=weights)
+        scales = {key:(float(np.nan_to_num(_weightedstd(np.nan_to_num(values), weights))) or 1) for key, values in features.items()}
+        centroids = {key:np.bincount(assignments, weights=np.nan_to_num(values) * weights) / totals for key, values in features.items()}
+        distances = sum([np.square(np.nan_to_num(values - centroids[key][assignments]) / scales[key]) for key, values in features.items()], np.zeros(len(items)))
+        medoids = createmedoids(assignments, distances)
+        with self.__cohorttype.scope():
+            centroids = [{key:float(values[index]) for key, values in centroids.items()} for index in range(len(medoids))]
+            representatives = [self.represent(items[medoid], *args, count=int(round(total)), centroid=centroid, **kwargs) for medoid, total, centroid in zip(medoids, totals, centroids)]
+        approximations = self.features(representatives, *args, **kwargs)
+        errors = {key:float(np.sqrt(_weightedmean(np.nan_to_num(np.square(values - approximations[key][assignments])), weights)) / scales[key]) for key, values in features.items()}
+        return CohortResult(representatives, assignments, errors)
+
+    def assign(self, features, weights, categories):
+        bins = {key:self.bins(key) for key in features.keys() if self.bins(key) > 1}
+        while True:
+            codes = [np.digitize(features[key], createedges(self.__method, features[key], weights, size)) for key, size in bins.items()]
+            assignments = creategroups(np.stack([*codes, categories], axis=1))
+            if self.__maxcohorts is None or np.max(assignments, initial=0) < self.__maxcohorts or not bins: return assignments
+            key = max(bins, key=bins.get)
+            bins[key] = bins[key] - 1
+            if bins[key] <= 1: del bins[key]
+
+
+class Household_Cohorts(Cohorts, cohorttype=Household, bins={'income':4, 'wealth':3, 'age':3}):
+    def categories(self, households, *args, **kwargs): return [(household.date, tuple(household.parameters.items())) for household in households]
+    def features(self, households, *args, **kwargs):
+        column = lambda function: np.array([function(household) for household in households], dtype='float64')
+        features = {key:column(lambda household: getattr(household.financials, key)) for key in ('income', 'wealth', 'value', 'consumption')}
+        features['age'] = column(lambda household: household.age)
+        features.update({'_'.join([key, field]):column(lambda household: getattr(getattr(household.financials, key), field)) for key in ('mortgage', 'studentloan', 'debt') for field in ('balance', 'rate', 'duration')})
+        features.update({'weight_' + key:column(lambda household: household.utility.weights[key]) for key in ('habitation', 'consumption')})
+        features.update({'habitation_' + key:column(lambda household: household.utility.functions['habitation'].weights[key]) for key in ('location', 'quality', 'space')})
+        features.update({'habitation_' + key:column(lambda household: household.utility.functions['habitation'].coefficents[key]) for key in ('elasticity',)})
+        return features
+
+    def represent(self, household, *args, count, centroid, **kwargs):
+        return Household(date=household.date, age=household.age, parameters=household.parameters, financials=household.financials, utility=household.utility, count=count)
+
+
+class Housing_Cohorts(Cohorts, cohorttype=Housing, bins={'price':4, 'rent':4}):
+    def categories(self, housings, *args, **kwargs): return [(housing.date, housing.geography) for housing in housings]
+    def features(self, housings, *args, **kwargs):
+        column = lambda function: np.array([function(housing) for housing in housings], dtype='float64')
+        features = {'price':column(lambda housing: housing.purchaseprice), 'rent':column(lambda housing: housing.rentercost), 'cost':column(lambda housing: housing.ownercost)}
+        features.update(Housing.materialize('location', 'quality', 'space', housings=housings))
+        return features
+
+    def represent(self, housing, *args, count, centroid, **kwargs):
+        prices = {key:centroid.get(key, getattr(housing, attr)) for key, attr in (('price', 'purchaseprice'), ('rent', 'rentercost'), ('cost', 'ownercost'))}
+        rates = {'valuerate':_constant(housing.valuerate), 'rentrate':_constant(housing.rentrate)}
+        return Housing(date=housing.date, geography=housing.geography, parameters=housing.parameters, concepts=housing.concepts, count=count, **prices, **rates)
@@ -10,20 +10,22 @@ import numpy as np
 from scipy.interpolate import interp1d
 from numbers import Number
 from collections import namedtuple as ntuple
+from collections import OrderedDict as ODict
 
 from utilities.dispatchers import key_singledispatcher as keydispatcher
 from utilities.strings import uppercase, dictstring
 
 __version__ = "1.0.0"
 __author__ = "Jack Kirby Cook"
-__all__ = ['Economy', 'Curve', 'Rate', 'Broker', 'Loan', 'Education', 'Bank']
+__all__ = ['Economy', 'Curve', 'Rate', 'Broker', 'Loan', 'LoanBook', 'Education', 'Bank']
 __copyright__ = "Copyright 2020, Jack Kirby Cook"
 __license__ = ""
 
 
 _convertKeys = ['year', 'month', 'week']
 _convertMatrix = np.array([[1, 12, 52], [1/12, 1, 52/12], [1/52, 12/52, 1]]) 
-_convertindex = lambda key: _convertKeys.index(key)
+_convertIndexes = {key:index for index, key in enumerate(_convertKeys)}
+_convertindex = lambda key: _convertIndexes[key]
 _convertfactor = lambda fromvalue, tovalue: _convertMatrix[_convertindex(fromvalue), _convertindex(tovalue)]
 _convertrate = lambda frombasis, tobasis, rate: pow((1 + rate), pow(_convertfactor(frombasis, tobasis), -1)) - 1
 _convertduration = lambda frombasis, tobasis, duration: duration * _convertfactor(frombasis, tobasis)
@@ -35,21 +37,66 @@ _curve = lambda x, y, method, fill: interp1d(x, y, kind=method, bounds_error=Fal
 downpayment = lambda x, ltv: x * (1 - ltv)
 financingcost = lambda x, r: x * r
 loantovalue = lambda x, v: x / v   
-loanvalue = lambda x, r, n, i: np.fv(r, i, -np.pmt(r, n, x), -x)
+growthvalue = lambda r, n: np.power(1 + np.asarray(r, dtype='float64'), n)
+
+
+def geometricseries(q, n):
+    q, n = np.asarray(q, dtype='float64'), np.asarray(n, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'): series = (1 - np.power(q, n)) / (1 - q)
+    return np.where(q == 1, n, series)
+
+
+def paymentvalue(x, r, n):
+    x, r, n = np.asarray(x, dtype='float64'), np.asarray(r, dtype='float64'), np.asarray(n, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment = np.where(r == 0, x / n, x * r / (1 - np.power(1 + r, -n)))
+    return np.where(n > 0, payment, 0)
+
+
+def balancevalue(x, r, n, i):
+    i = np.minimum(i, n)
+    return x * growthvalue(r, i) - paymentvalue(x, r, n) * geometricseries(1 + np.asarray(r, dtype='float64'), i)
 
 
 @keydispatcher
-def createcurve(extrapolate, x, y, *args, **kwargs): raise KeyError(extrapolate)
-@createcurve.register('average')
-def createcurve_average(x, y, *args, method, **kwargs): return _curve(x, y, method, (np.average(y), np.average(y)))
-@createcurve.register('last')
-def createcurve_last(x, y, *args, method, **kwargs): return _curve(x, y, method, (y[np.argmin(x)], y[np.argmax(x)]))   
+def createfill(extrapolate, x, y, *args, **kwargs): raise KeyError(extrapolate)
+@createfill.register('average')
+def createfill_average(x, y, *args, **kwargs): return (np.average(y), np.average(y))
+@createfill.register('last')
+def createfill_last(x, y, *args, **kwargs): return (y[np.argmin(x)], y[np.argmax(x)])   
+
+
+def createcurve(extrapolate, x, y, *args, method, **kwargs): return _curve(x, y, method, createfill(extrapolate, x, y, *args, **kwargs))
+
+
+def createlinear(x, y, left, right):
+    order = np.argsort(x)
+    x, y = np.asarray(x, dtype='float64')[order], np.asarray(y, dtype='float64')[order]
+    return lambda values: np.interp(values, x, y, left=left, right=right)
 
 
 class Economy(ntuple('Economy', 'date wealthrate incomerate inflationrate depreciationrate purchasepower housingpower')):
     def __repr__(self):    
         content = {field:repr(getattr(self, field)) for field in self._fields}
         return '{}({})'.format(self.__class__.__name__, ', '.join(['='.join([key, value]) for key, value in content.items()]))
+
+    def cpi(self, date): return self.deflator('inflationrate', date)
+    def hpi(self, date): return self.deflator('depreciationrate', date)
+    def deflator(self, ratekey, date):
+        try: deflators = self.__deflators
+        except AttributeError: deflators = self.__deflators = {}
+        try: table, tail = deflators[ratekey]
+        except KeyError: table, tail = deflators[ratekey] = self.__deflatortable(getattr(self, ratekey))
+        index = date.year - self.date.year
+        if index <= 0: return 1
+        elif index < len(table): return table[index]
+        else: return table[-1] * pow(1 + tail, index - len(table) + 1)
+
+    def __deflatortable(self, rate):
+        years = np.arange(self.date.year, max(self.date.year, int(np.max(rate.x))) + 1)
+        rates = np.asarray(rate(years, units='year'))
+        table = np.concatenate([np.ones(1), np.cumprod(1 + rates)])
+        return table, rate(years[-1] + 1, units='year')
     
 
 class Curve(ntuple('Curve', 'x y')):
@@ -71,13 +118,70 @@ class Curve(ntuple('Curve', 'x y')):
 
 
 class Rate(Curve):
-    def __call__(self, x, *args, units, **kwargs): return float(_convertrate(self.__basis, units, super().__call__(x, *args, **kwargs)))
-    def __init__(self, *args, basis, **kwargs): 
-        self.__basis = basis
-        super().__init__(*args, **kwargs)
+    def __call__(self, x, *args, units, **kwargs): 
+        try: curve = self.__curves[units]
+        except KeyError: curve = self.__curves[units] = self.__createcurve(units)
+        y = curve(x)
+        return float(y) if np.ndim(y) == 0 else y
+
+    def __init__(self, *args, basis, extrapolate='average', method='linear', **kwargs): 
+        self.__basis, self.__extrapolate, self.__method = basis, extrapolate, method
+        self.__curves = {}
+        super().__init__(*args, extrapolate=extrapolate, method=method, **kwargs)
+
+    def __createcurve(self, units):
+        if self.__method != 'linear': return lambda x: _convertrate(self.__basis, units, super(Rate, self).__call__(x))
+        y = _convertrate(self.__basis, units, np.asarray(self.y, dtype='float64'))
+        left, right = [_convertrate(self.__basis, units, value) for value in createfill(self.__extrapolate, self.x, self.y)]
+        return createlinear(self.x, y, left, right)
             
 
+class LoanBook(object):
+    def __repr__(self): return '{}(schedules={}, maxsize={})'.format(self.__class__.__name__, len(self), self.__maxsize)
+    def __len__(self): return len(self.__schedules)
+    def __init__(self, maxsize=4096): 
+        assert maxsize is None or int(maxsize) > 0
+        self.__maxsize = int(maxsize) if maxsize is not None else None
+        self.clear()
+    def clear(self): self.__schedules = ODict()
+
+    @property
+    def maxsize(self): return self.__maxsize
+
+    @staticmethod
+    def terms(loans):
+        terms = np.array([(loan.balance, loan.rate, loan.duration) for loan in loans], dtype='float64').reshape(-1, 3)
+        return terms[:, 0], terms[:, 1], terms[:, 2].astype('int64')
+
+    def payments(self, loans): 
+        balances, rates, durations = self.terms(loans)
+        return paymentvalue(balances, rates, durations)
+    
+    def balances(self, loans, horizons):
+        balances, rates, durations = self.terms(loans)
+        return balancevalue(balances, rates, durations, np.asarray(horizons))
+
+    def schedule(self, loan): return self.schedules([loan])[0]
+    def schedules(self, loans):
+        keys = [(loan.balance, loan.rate, loan.duration) for loan in loans]
+        missing = list({key:loan for key, loan in zip(keys, loans) if key not in self.__schedules}.items())
+        if missing:
+            balances, rates, durations = self.terms([loan for key, loan in missing])
+            periods = np.arange(np.max(durations) + 1)[np.newaxis, :]
+            balancematrix = balancevalue(balances[:, np.newaxis], rates[:, np.newaxis], durations[:, np.newaxis], periods)
+            paymentmatrix = np.where((periods >= 1) & (periods <= durations[:, np.newaxis]), paymentvalue(balances, rates, durations)[:, np.newaxis], 0)
+            for index, (key, loan) in enumerate(missing):
+                self.__schedules[key] = (balancematrix[index, :durations[index]+1], paymentmatrix[index, :durations[index]+1])
+        schedules = [self.__schedules[key] for key in keys]
+        if self.__maxsize is None: return schedules
+        for key in keys: self.__schedules.move_to_end(key)
+        while len(self.__schedules) > self.__maxsize: self.__schedules.popitem(last=False)
+        return schedules
+
+
 class Loan(ntuple('Loan', 'type balance rate duration')):
+    __book = LoanBook()
+
     stringformat = 'Loan|{type} of ${balance:.0f} @ {rate:.3f}%/YR for {duration:.0f}MOS' 
     emptystringformat = 'Loan|{type} of ${balance:.0f}'
     def __str__(self): 
@@ -102,10 +206,18 @@ class Loan(ntuple('Loan', 'type balance rate duration')):
         balance = balance if balance else 0
         return super().__new__(cls, loantype, balance, rate, duration)    
 
+    @classmethod
+    def book(cls): return cls.__book
+    @classmethod
+    def clear(cls): cls.__book.clear()
+    @classmethod
+    def customize(cls, *args, **kwargs): cls.__book = kwargs.get('book', cls.__book)
+    @property
+    def schedule(self): return self.__book.schedule(self)
     @property
-    def payment(self): return -np.pmt(self.rate, self.duration, self.balance) if self.balance else 0
+    def payment(self): return float(paymentvalue(self.balance, self.rate, self.duration)) if self.balance else 0
     def projection(self, horizon):
-        balance = loanvalue(self.balance, self.rate, self.duration, min(horizon, self.duration)) if self.balance else 0
+        balance = float(balancevalue(self.balance, self.rate, self.duration, min(horizon, self.duration))) if self.balance else 0
         duration = max(self.duration - horizon, 0)
         return self.__class__(self.type, balance=balance, duration=duration, rate=self.rate, basis='month')
 
@@ -114,7 +226,7 @@ class Broker(ntuple('Broker', 'commissions')):
     stringformat = 'Broker|{commissions:.3f}%' 
     def __str__(self): return self.stringformat.format(commissions=self.commissions)          
     def __repr__(self): return '{}({})'.format(self.__class__.__name__, dictstring(self._asdict()))
-    def cost(self, amount): return amount * (1 + self.commisions)    
+    def cost(self, amount): return amount * (1 + self.commissions)    
  
     
 class Education(ntuple('Education', 'type cost duration')):
@@ -6,10 +6,15 @@ Created on Mon Apr 27 2020
 
 """
 
+import logging
+import threading
 import numpy as np
 import pandas as pd
 from numbers import Number
+from concurrent.futures import ThreadPoolExecutor
 from itertools import product
+from functools import partial
+from collections.abc import Mapping, Hashable
 from scipy.linalg import cholesky, eigh
 from collections import OrderedDict as ODict
 
@@ -25,15 +30,31 @@ __copyright__ = "Copyright 2020, Jack Kirby Cook"
 __license__ = ""
 
 
+LOGGER = logging.getLogger(__name__)
+LEGACYLOCK = threading.RLock()
+
+
 _aslist = lambda items: [items] if not isinstance(items, (list, tuple)) else list(items)
 _filterempty = lambda items: [item for item in _aslist(items) if item]
 _flatten = lambda nesteditems: [item for items in nesteditems for item in items]
+_unique = lambda items: list(ODict.fromkeys(items).keys())
+_hashable = lambda value: value if isinstance(value, Hashable) else id(value)
+_signature = lambda args, kwargs: (tuple(_hashable(value) for value in args), tuple(sorted((key, _hashable(value)) for key, value in kwargs.items())))
+
+
+def _asarray(items):
+    if all([isinstance(item, Number) for item in items]): return np.array(items)
+    array = np.empty(len(items), dtype=object)
+    for index, item in enumerate(items): array[index] = item
+    return array
 
 
 class Feed(object):
-    def __init__(self, calculations, renderer, **tables):
+    def __init__(self, calculations, renderer, verbose=False, **tables):
         self.__calculations = calculations
         self.__renderer = renderer
+        self.__verbose = verbose
+        self.__rendered = set()
         self.__tables = tables
 
     def __call__(self, *args, geography, **kwargs): 
@@ -46,28 +67,52 @@ class Feed(object):
             return self.__gettable(self.__tables[key], *args, geography=geography, dates=dates, **kwargs)
         return wrapper
 
+    def batch(self, *args, geographies, workers=None, **kwargs):
+        dates = set(_filterempty(_aslist(kwargs.pop('date', None)) + _aslist(kwargs.pop('dates', []))))
+        geographies, tableIDs = _unique(_aslist(geographies)), _unique(self.__tables.values())
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {(tableID, geography):executor.submit(self.__gettable, tableID, *args, geography=geography, dates=dates, **kwargs) for geography in geographies for tableID in tableIDs}
+            results = {scope:future.result() for scope, future in futures.items()}
+        return {geography:{tableKey:results[(tableID, geography)] for tableKey, tableID in self.__tables.items()} for geography in geographies}
+
     def __gettables(self, *args, **kwargs):
-        return {tableKey:self.__gettable(tableID, *args, **kwargs) for tableKey, tableID in self.__tables.items()}
+        results = {tableID:self.__gettable(tableID, *args, **kwargs) for tableID in _unique(self.__tables.values())}
+        return {tableKey:results[tableID] for tableKey, tableID in self.__tables.items()}
     
     def __gettable(self, tableID, *args, **kwargs):
-        print(self.__renderer(self.__calculations[tableID]), '\n')
+        self.__render(tableID)
         return self.__calculations[tableID](*args, **kwargs)   
 
+    def __render(self, tableID):
+        if not self.__verbose or tableID in self.__rendered or not LOGGER.isEnabledFor(logging.INFO): return
+        self.__rendered.add(tableID)
+        LOGGER.info('%s\n', self.__renderer(self.__calculations[tableID]))
+
 
 class Data(object):
     @property
     def axes(self): return self.__axes
+    @property
+    def indexes(self): return self.__indexes
     
-    def __init__(self, **tables): self.__tables, self.__axes = tables, self.__getaxes(**tables)
-    def __getaxes(self, **tables):
-        axiskeys = set(_flatten([table.headerkeys for table in tables.values()]))
-        axiskeys = [axiskey for axiskey in axiskeys if all([axiskey in table.headers for table in tables.values()])]
-        headers = list(tables.values())[0].headers
-        return [axiskey for axiskey in axiskeys if all([set(headers[axiskey]) == set(table.headers[axiskey]) for table in list(tables.values())[1:]])]
-
-    def iterate(self, *axes):
+    def __init__(self, memosize=128, **tables): 
+        assert memosize is None or int(memosize) >= 0
+        self.__tables, self.__memosize, self.__memo = tables, memosize, ODict()
+        self.__indexes = {key:{axis:{header:position for position, header in enumerate(table.headers[axis])} for axis in table.headerkeys} for key, table in tables.items()}
+        self.__axes = self.__getaxes(**self.__indexes)
+        
+    def __getaxes(self, **indexes):
+        axiskeys = set(_flatten([index.keys() for index in indexes.values()]))
+        axiskeys = [axiskey for axiskey in axiskeys if all([axiskey in index for index in indexes.values()])]
+        headers = list(indexes.values())[0]
+        return [axiskey for axiskey in axiskeys if all([headers[axiskey].keys() == index[axiskey].keys() for index in list(indexes.values())[1:]])]
+
+    def iterate(self, *axes, bundle=False):
         assert all([axis in self.__axes for axis in axes])
-        for items in product(*[list(self.__tables.values())[0].headers[axis] for axis in axes]): yield items
+        headers = list(self.__indexes.values())[0]
+        for items in product(*[list(headers[axis].keys()) for axis in axes]): 
+            if not bundle: yield items
+            else: yield items, self(**{axis:item for axis, item in zip(axes, items)})
           
     def __getitem__(self, key):
         assert key in self.__tables.keys()
@@ -78,16 +123,51 @@ class Data(object):
         if not key: return {key:self.__gettable(key, *args, **kwargs) for key in self.__tables.keys()} 
         else: return self.__gettable(key, *args, **kwargs)        
         
+    def clear(self): self.__memo.clear()
     def __gettable(self, key, *args, **kwargs):        
         newscope = {axis:kwargs[axis] for axis in self.__tables[key].headerkeys if axis in kwargs.keys()}
-        table = self.__tables[key].sel(**newscope)
-        for scopekey in newscope.keys(): table = table.squeeze(scopekey)
+        if self.__memosize == 0 or not all([isinstance(value, Hashable) for value in newscope.values()]): return self.__slicetable(key, newscope)
+        memokey = (key, tuple(newscope.items()))
+        if memokey in self.__memo: self.__memo.move_to_end(memokey)
+        else: self.__memo[memokey] = self.__slicetable(key, newscope)
+        while self.__memosize is not None and len(self.__memo) > self.__memosize: self.__memo.popitem(last=False)
+        return self.__memo[memokey]
+        
+    def __slicetable(self, key, scope):
+        table, index = self.__tables[key], self.__indexes[key]
+        try: positions = {axis:index[axis][value] for axis, value in scope.items()}
+        except (KeyError, TypeError): positions = None
+        if positions is not None and hasattr(table, 'isel'): table = table.isel(**{axis:slice(position, position + 1) for axis, position in positions.items()})
+        else: table = table.sel(**scope)
+        for scopekey in scope.keys(): table = table.squeeze(scopekey)
         return table         
         
 
+class LazyComponents(Mapping):
+    def __repr__(self): return '{}(built={}, pending={})'.format(self.__class__.__name__, list(self.__components.keys()), [key for key in self.__builders.keys() if key not in self.__components])
+    def __init__(self, builders): self.__builders, self.__components = builders, {}
+    def __contains__(self, key): return key in self.__builders
+    def __iter__(self): return iter(self.__builders)
+    def __len__(self): return len(self.__builders)
+    def __getitem__(self, key):
+        try: return self.__components[key]
+        except KeyError: self.__components[key] = self.__builders[key]()
+        return self.__components[key]
+
+    @property
+    def built(self): return list(self.__components.keys())
+
+
 class Environment(object):
     __counttables = ('households', 'structures', 'population')
     __ratetables = ('discountrate', 'incomerate', 'wealthrate', 'valuerate', 'rentrate')
+    __memo = None
+
+    @classmethod
+    def customize(cls, *args, memo=False, **kwargs): cls.__memo = {} if memo else None
+    @classmethod
+    def clear(cls): 
+        if cls.__memo is not None: cls.__memo.clear()
     
     @property
     def geography(self): return self.__geography
@@ -108,16 +188,19 @@ class Environment(object):
         assert not any([key in tables.keys() for key in concepts.keys()])
         assert all([table.scope['geography'][()] == geography for table in tables.values()])
         self.__geography, self.__date = geography, date
+        histogramtables = {tablekey:table for tablekey, table in tables.items() if tablekey not in (*self.__ratetables, *self.__counttables)}
+        ratesources = {ratekey:(tables[ratekey] if ratekey in tables.keys() else kwargs[ratekey]) for ratekey in self.__ratetables}
         
-        self.__histograms = {}
-        for tablekey, table in tables.items():
-            if tablekey not in (*self.__ratetables, *self.__counttables):
-                try: self.__histograms[tablekey] = self.__gethistogram(table, date, *args, **kwargs)
-                except EmptyHistArrayError: self.__histograms[tablekey] = None        
-        
-        self.__rates = {ratekey:self.__getrate(tables[ratekey] if ratekey in tables.keys() else kwargs[ratekey], date, *args, basis=basis, **kwargs) for ratekey in self.__ratetables}
-        self.__counts = {countkey:self.__getcount(tables[countkey], date, *args, **kwargs) for countkey in self.__counttables}
-        self.__concepts = {conceptkey:Concept(self.__histograms, *args, **kwargs) for conceptkey, Concept in concepts.items()}
+        self.__histograms = LazyComponents({tablekey:partial(self.__component, 'histogram', tablekey, (table,), self.__gethistogram, table, date, *args, **kwargs) for tablekey, table in histogramtables.items()})
+        self.__rates = LazyComponents({ratekey:partial(self.__component, 'rate', ratekey, (source,), self.__getrate, source, date, *args, basis=basis, **kwargs) for ratekey, source in ratesources.items()})
+        self.__counts = LazyComponents({countkey:partial(self.__component, 'count', countkey, (tables[countkey],), self.__getcount, tables[countkey], date, *args, **kwargs) for countkey in self.__counttables})
+        self.__concepts = LazyComponents({conceptkey:partial(self.__component, 'concept', conceptkey, (Concept, *histogramtables.values()), Concept, self.__histograms, *args, **kwargs) for conceptkey, Concept in concepts.items()})
+
+    def __component(self, kind, key, references, function, *args, **kwargs):
+        if self.__memo is None: return function(*args, **kwargs)
+        memokey = (kind, key, self.__geography, self.__date, tuple(id(reference) for reference in references), _signature(args[1:], kwargs))
+        if memokey not in self.__memo: self.__memo[memokey] = (references, args, kwargs, function(*args, **kwargs))
+        return self.__memo[memokey][-1]
             
     def __getitem__(self, key):
         if key in self.__counts: return self.__counts[key]
@@ -127,7 +210,9 @@ class Environment(object):
         else: raise KeyError(key)
 
     def __getcount(self, table, date, *args, **kwargs): return table.sel(**{'date':date}).squeeze('date').arrays[table.datakeys[0]][()]    
-    def __gethistogram(self, table, date, *args, **kwargs): return table.sel(**{'date':date}).squeeze('date').tohistogram(*args, how='average', **kwargs)
+    def __gethistogram(self, table, date, *args, **kwargs): 
+        try: return table.sel(**{'date':date}).squeeze('date').tohistogram(*args, how='average', **kwargs)
+        except EmptyHistArrayError: return None
     
     @typedispatcher
     def __getrate(self, table, date, *args, extrapolate, basis, weights=None, **kwargs): 
@@ -148,22 +233,66 @@ class MonteCarlo(object):
     @property
     def variables(self): return {histogram.axiskey:histogram.axisvariable for histogram in self.__histograms.values()}
 
-    def __init__(self, **histograms):
+    @property
+    def seed(self): return self.__seedsequence
+    @property
+    def correlationmatrix(self): return self.__correlationmatrix
+    @correlationmatrix.setter
+    def correlationmatrix(self, correlationmatrix):
+        correlationmatrix = np.array(correlationmatrix, dtype='float64')
+        assert correlationmatrix.shape == (len(self.__histograms), len(self.__histograms))
+        assert np.all(np.isfinite(correlationmatrix))
+        self.__correlationmatrix = self.__repair(correlationmatrix)
+        self.__identity = np.allclose(self.__correlationmatrix, np.eye(len(self.__histograms)))
+        self.__factors = {}
+
+    def __init__(self, *args, seed=None, correlationmatrix=None, sampler=None, **histograms):
+        self.__sampler = sampler
         self.__histograms = ODict([(key, value) for key, value in histograms.items()])
-        self.__correlationmatrix = np.zeros((len(histograms), len(histograms)))
-        np.fill_diagonal(self.__correlationmatrix, 1)
-        
-    def samplematrix(self, size, *args, method='cholesky', **kwargs):
-        try: size = int(size)
-        except: size = size.astype('int64')
-        samplematrix = np.array([histogram(size) for histogram in self.__histograms.values()]) 
+        self.__lookups = {}
+        self.__seedsequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.__generator = np.random.default_rng(self.__seedsequence)
+        self.correlationmatrix = correlationmatrix if correlationmatrix is not None else np.eye(len(histograms))
+
+    def spawn(self, number):
+        return [self.__class__(seed=seedsequence, correlationmatrix=self.__correlationmatrix, sampler=self.__sampler, **self.__histograms) for seedsequence in self.__seedsequence.spawn(number)]
+
+    @staticmethod
+    def __repair(correlationmatrix, tolerance=1e-10):
+        correlationmatrix = (correlationmatrix + correlationmatrix.transpose()) / 2
+        evals, evecs = eigh(correlationmatrix)
+        if np.min(evals) < tolerance: correlationmatrix = evecs @ np.diag(np.clip(evals, tolerance, None)) @ evecs.transpose()
+        scale = np.sqrt(np.diag(correlationmatrix))
+        correlationmatrix = correlationmatrix / np.outer(scale, scale)
+        np.fill_diagonal(correlationmatrix, 1)
+        return np.clip(correlationmatrix, -1, 1)
+
+    def __factor(self, method):
+        try: return self.__factors[method]
+        except KeyError: pass
         if method == 'cholesky':
-            correlation_matrix = cholesky(self.__correlationmatrix, lower=True)
+            self.__factors[method] = cholesky(self.__correlationmatrix, lower=True)
         elif method == 'eigen':
             evals, evecs = eigh(self.__correlationmatrix)
-            correlation_matrix = np.dot(evecs, np.diag(np.sqrt(evals)))
+            self.__factors[method] = np.dot(evecs, np.diag(np.sqrt(np.clip(evals, 0, None))))
         else: raise ValueError(method)
-        return np.dot(correlation_matrix, samplematrix) 
+        return self.__factors[method]
+
+    def __sample(self, histogram, size):
+        if self.__sampler is not None: return self.__sampler(histogram, size, self.__generator)
+        seed = self.__generator.integers(0, 2**32 - 1)
+        with LEGACYLOCK:
+            state = np.random.get_state()
+            np.random.seed(seed)
+            try: return histogram(size)
+            finally: np.random.set_state(state)
+
+    def samplematrix(self, size, *args, method='cholesky', **kwargs):
+        try: size = int(size)
+        except: size = size.astype('int64')
+        samplematrix = np.array([self.__sample(histogram, size) for histogram in self.__histograms.values()]) 
+        if self.__identity: return samplematrix
+        return np.dot(self.__factor(method), samplematrix) 
     
     def sampledataframe(self, size, *args, **kwargs):
         try: size = int(size)
@@ -172,9 +301,36 @@ class MonteCarlo(object):
         sampletable = {key:list(values) for key, values in zip(self.keys, samplematrix)}
         return pd.DataFrame(sampletable)        
     
+    def samplearrays(self, size, *args, **kwargs):
+        samplematrix = self.samplematrix(size, *args, **kwargs)
+        return {key:self.__fromindexes(key, values) for key, values in zip(self.keys, samplematrix)}
+
+    def iterchunks(self, size, chunksize, *args, **kwargs):
+        size, chunksize = int(size), int(chunksize)
+        assert chunksize > 0
+        for start in range(0, size, chunksize): yield self.samplearrays(min(chunksize, size - start), *args, **kwargs)
+
+    def __fromindexes(self, key, indexes):
+        indexes, variable = np.asarray(indexes), self.variables[key]
+        if not indexes.size: return np.array([])
+        if not np.all(np.isfinite(indexes)) or np.any(np.mod(indexes, 1)):
+            uniques, inverse = np.unique(indexes, return_inverse=True)
+            return _asarray([variable.fromindex(index) for index in uniques])[np.ravel(inverse)]
+        indexes = indexes.astype('int64')
+        offset, values = self.__lookup(key, variable, int(np.min(indexes)), int(np.max(indexes)))
+        return values[indexes - offset]
+
+    def __lookup(self, key, variable, lower, upper):
+        offset, values = self.__lookups.get(key, (lower, []))
+        if offset <= lower and upper < offset + len(values): return offset, values
+        newoffset, newupper = min(lower, offset), max(upper, offset + len(values) - 1)
+        values = [values[index - offset] if offset <= index < offset + len(values) else variable.fromindex(index) for index in range(newoffset, newupper + 1)]
+        self.__lookups[key] = (newoffset, _asarray(values))
+        return self.__lookups[key]
+
     def __call__(self, size, *args, **kwargs):
-        for index, values in self.sampledataframe(size).iterrows():  
-            values = {key:self.variables[key].fromindex(value) for key, value in values.to_dict().items()}
+        samplearrays = self.samplearrays(size, *args, **kwargs)
+        for index in range(int(size)):  
+            values = {key:samplearrays[key][index] for key in self.keys}
             yield index, values  
 
-    
\ No newline at end of file
@@ -10,11 +10,12 @@ import numpy as np
 import pandas as pd
 from collections import namedtuple as ntuple
 
-from realestate.economy import Loan
+from realestate.caches import InstanceKey
+from realestate.economy import Loan, growthvalue, geometricseries, paymentvalue, balancevalue
 
 __version__ = "1.0.0"
 __author__ = "Jack Kirby Cook"
-__all__ = ['Financials']
+__all__ = ['Financials', 'FinancialsArray']
 __copyright__ = "Copyright 2020, Jack Kirby Cook"
 __license__ = ""
 
@@ -22,22 +23,18 @@ __license__ = ""
 theta = lambda dr, wr, risk: (wr - dr) / risk
 pad = lambda *xns: max([len(xn) for xn in xns])
 
-loanvalue = lambda x, r, n, i: np.fv(r, i, -np.pmt(r, n, x), -x)
-flowvalue = lambda x, r, i: np.fv(r, i, 0, -x)
-assetvalue = lambda x, r, i: np.fv(r, i, 0, -x)
+loanvalue = lambda x, r, n, i: balancevalue(x, r, n, i)
+flowvalue = lambda x, r, i: x * growthvalue(r, i)
+assetvalue = lambda x, r, i: x * growthvalue(r, i)
 
 iarray = lambda n: np.arange(n+1)
 farray = lambda r, n: (np.ones(n) * np.array(1 + r)) ** iarray(n-1) 
 
-imatrix = lambda n: np.triu(-np.subtract(*np.mgrid[0:n, 0:n]))
-rmatrix = lambda r, n: np.ones((n,n)) * (1+r)
-fmatrix = lambda r, n: np.triu(rmatrix(r, n) ** imatrix(n))
-
-loanarray = lambda x, r, n: np.fv(r, iarray(n), -np.pmt(r, n, x), -x)
-flowarray = lambda x, r, n: np.fv(r, iarray(n), 0, -x)
-assetarray = lambda x, r, n: np.fv(r, iarray(n), 0, -x)
-payarray = lambda x, r, n: np.concatenate([np.array([0]), -np.ones(n) * np.pmt(r, n, x)])
-investarray = lambda xn, r: np.sum(fmatrix(r, len(xn)) * np.expand_dims(xn, 1), axis=0)
+loanarray = lambda x, r, n: balancevalue(x, r, n, iarray(n))
+flowarray = lambda x, r, n: x * growthvalue(r, iarray(n))
+assetarray = lambda x, r, n: x * growthvalue(r, iarray(n))
+payarray = lambda x, r, n: np.concatenate([np.array([0]), np.ones(n) * paymentvalue(x, r, n)])
+investarray = lambda xn, r: farray(r, len(xn)) * np.cumsum(xn / farray(r, len(xn)))
 
 addarrays = lambda *xns: sum(xns)
 padarrays = lambda *xns: [np.pad(xn, (0, max(pad(*xns)-len(xn), 0)), mode='constant') for xn in xns]
@@ -47,9 +44,21 @@ income_factor = lambda ir, wr, n: np.sum(farray(ir, n) * farray(wr, n))
 consumption_factor = lambda cr, wr, n: np.sum(farray(cr, n) * farray(wr, n)) 
 loan_factor = lambda wr, n: np.sum(farray(wr, n))
 
+def wealthvalue(horizon, wealth, income, consumption, *args, incomehorizon, consumptionhorizon, wealthrate, incomerate, consumptionrate, payments=[], **kwargs):
+    horizon = np.asarray(horizon, dtype='float64')
+    factor, ratio = growthvalue(wealthrate, horizon - 1), 1 + np.asarray(wealthrate, dtype='float64')
+    incomes = income * factor * geometricseries((1 + np.asarray(incomerate)) / ratio, np.minimum(np.asarray(incomehorizon) + 1, horizon))
+    consumptions = consumption * factor * geometricseries((1 + np.asarray(consumptionrate)) / ratio, np.minimum(np.asarray(consumptionhorizon) + 1, horizon))
+    durations = [np.clip(np.minimum(duration, horizon - 1), 0, None) for payment, duration in payments]
+    loans = sum([payment * growthvalue(wealthrate, horizon - 1 - duration) * geometricseries(ratio, duration) for (payment, _), duration in zip(payments, durations)])
+    return wealth * growthvalue(wealthrate, horizon) + incomes - consumptions - loans
+
+
+def terminalwealth(*args, consumptionhorizon, **kwargs): return wealthvalue(consumptionhorizon, *args, consumptionhorizon=consumptionhorizon, **kwargs)
+
 
-def createFinancialsKey(*args, incomehorizon, consumptionhorizon, income, consumption, wealth, value, loans=[], **kwargs):
-    return (incomehorizon, consumptionhorizon, int(income), int(consumption), int(wealth), int(value), *[hash(loan.key) for loan in loans],)
+def createFinancialsKey(*args, incomehorizon, consumptionhorizon, income, consumption, wealth, value, mortgage, studentloan, debt, **kwargs):
+    return InstanceKey((incomehorizon, consumptionhorizon, int(income), int(consumption), int(wealth), int(value), mortgage.key, studentloan.key, debt.key,))
         
 
 class UnstableLifeStyleError(Exception): pass
@@ -85,8 +94,13 @@ class Financials(ntuple('Financials', 'incomehorizon consumptionhorizon income w
         if self.ponzi(*args, **kwargs): raise UnstableLifeStyleError()
 
     @property
-    def key(self): return hash(createFinancialsKey(**self.todict()))
-    def __ne__(self, other): return not self.__eq__()
+    def key(self): 
+        try: return self.__key
+        except AttributeError: 
+            self.__key = createFinancialsKey(**self.todict())
+            return self.__key
+    def __hash__(self): return hash(self.key)
+    def __ne__(self, other): return not self.__eq__(other)
     def __eq__(self, other): 
         assert isinstance(other, type(self))
         return self.key == other.key
@@ -102,6 +116,10 @@ class Financials(ntuple('Financials', 'incomehorizon consumptionhorizon income w
     @property
     def loans(self): return dict(mortgage=self.mortgage, studentloan=self.studentloan, debt=self.debt) 
     @property
+    def horizons(self): return dict(incomehorizon=self.incomehorizon, consumptionhorizon=self.consumptionhorizon)
+    @property
+    def payments(self): return [(paymentvalue(loan.balance, loan.rate, loan.duration), loan.duration) for loan in self.loans.values()]
+    @property
     def netwealth(self): return self.wealth - sum([loan.balance for loan in self.loans.values()])
     
     def todict(self): return self._asdict()
@@ -111,15 +129,12 @@ class Financials(ntuple('Financials', 'incomehorizon consumptionhorizon income w
         else: raise TypeError(type(item).__name__)
 
     def table(self, *args, wealthrate, incomerate, **kwargs):       
-        mortgage = loanarray(self.mortgage.balance, self.mortgage.rate, self.mortgage.duration) if self.mortgage else np.array([])
-        studentloan = loanarray(self.studentloan.balance, self.studentloan.rate, self.studentloan.duration) if self.studentloan else np.array([])
-        debt = loanarray(self.debt.balance, self.debt.rate, self.debt.duration) if self.debt else np.array([])
+        mortgage, mortgagepayments = self.mortgage.schedule if self.mortgage else (np.array([]), np.array([]))
+        studentloan, studentloanpayments = self.studentloan.schedule if self.studentloan else (np.array([]), np.array([]))
+        debt, debtpayments = self.debt.schedule if self.debt else (np.array([]), np.array([]))
         income = flowarray(self.income, incomerate, self.incomehorizon)
         consumption = flowarray(self.consumption, theta(self.discountrate, wealthrate, self.risktolerance), self.consumptionhorizon)
         value = assetarray(self.value, kwargs['valuerate'], self.consumptionhorizon) if self.value > 0 else np.array([])
-        mortgagepayments = payarray(self.mortgage.balance, self.mortgage.rate, self.mortgage.duration) if self.mortgage else np.array([])
-        studentloanpayments = payarray(self.studentloan.balance, self.studentloan.rate, self.studentloan.duration) if self.studentloan else np.array([])       
-        debtpayments = payarray(self.debt.balance, self.debt.rate, self.debt.duration) if self.debt else np.array([])
         income, consumption, mortgagepayments, studentloanpayments, debtpayments = padarrays(income, consumption, mortgagepayments, studentloanpayments, debtpayments)
         savings = addarrays(income, -consumption, -mortgagepayments, -studentloanpayments, -debtpayments)
         cashflows = np.concatenate([np.array([self.wealth]), savings])
@@ -135,19 +150,11 @@ class Financials(ntuple('Financials', 'incomehorizon consumptionhorizon income w
         assert isinstance(horizon, int) and horizon <= self.consumptionhorizon
         income = flowvalue(self.income, incomerate, min(horizon, self.incomehorizon)) if horizon <= self.incomehorizon else 0
         consumption = flowvalue(self.consumption, theta(self.discountrate, wealthrate, self.risktolerance), horizon) 
-        mortgage = self.mortgage(horizon) if self.mortgage else None
-        studentloan = self.studentloan(horizon) if self.studentloan else None
-        debt = self.debt(horizon) if self.debt else None
+        mortgage = self.mortgage.projection(horizon) if self.mortgage else None
+        studentloan = self.studentloan.projection(horizon) if self.studentloan else None
+        debt = self.debt.projection(horizon) if self.debt else None
         value = assetvalue(self.value, kwargs['valuerate'], horizon) if self.value else 0       
-        incomearray = flowarray(self.income, incomerate, self.incomehorizon)
-        consumptionarray = flowarray(self.consumption, theta(self.discountrate, wealthrate, self.risktolerance), self.consumptionhorizon)
-        mortgagepayments = payarray(self.mortgage.balance, self.mortgage.rate, self.mortgage.duration) if self.mortgage else np.array([])
-        studentloanpayments = payarray(self.studentloan.balance, self.studentloan.rate, self.studentloan.duration) if self.studentloan else np.array([])        
-        debtpayments = payarray(self.debt.balance, self.debt.rate, self.debt.duration) if self.debt else np.array([])
-        incomearray, consumptionarray, mortgagepayments, studentloanpayments, debtpayments = padarrays(incomearray, consumptionarray, mortgagepayments, studentloanpayments, debtpayments)
-        savings = addarrays(incomearray, -consumptionarray, -mortgagepayments, -studentloanpayments, -debtpayments)       
-        cashflows = np.concatenate([np.array([self.wealth]), savings])
-        wealth = investarray(cashflows, wealthrate)[horizon]
+        wealth = float(wealthvalue(horizon, self.wealth, self.income, self.consumption, **self.horizons, wealthrate=wealthrate, incomerate=incomerate, consumptionrate=theta(self.discountrate, wealthrate, self.risktolerance), payments=self.payments))
         consumptionhorizon = self.consumptionhorizon - horizon 
         incomehorizon = max(self.incomehorizon - horizon, 0)
         assets = dict(wealth=wealth, value=value)
@@ -157,20 +164,11 @@ class Financials(ntuple('Financials', 'incomehorizon consumptionhorizon income w
         return self.__class__(incomehorizon, consumptionhorizon, **assets, **flows, **loans, **rates)
 
     def ponzi(self, *args, wealthrate, incomerate, **kwargs):          
-        incomearray = flowarray(self.income, incomerate, self.incomehorizon)
-        consumptionarray = flowarray(self.consumption, theta(self.discountrate, wealthrate, self.risktolerance), self.consumptionhorizon)
-        mortgagepayments = payarray(self.mortgage.balance, self.mortgage.rate, self.mortgage.duration) if self.mortgage else np.array([])
-        studentloanpayments = payarray(self.studentloan.balance, self.studentloan.rate, self.studentloan.duration) if self.studentloan else np.array([])        
-        debtpayments = payarray(self.debt.balance, self.debt.rate, self.debt.duration) if self.debt else np.array([])
-        incomearray, consumptionarray, mortgagepayments, studentloanpayments, debtpayments = padarrays(incomearray, consumptionarray, mortgagepayments, studentloanpayments, debtpayments)
-        savings = addarrays(incomearray, -consumptionarray, -mortgagepayments, -studentloanpayments, -debtpayments)       
-        cashflows = np.concatenate([np.array([self.wealth]), savings])
-        wealth = investarray(cashflows, wealthrate)[self.consumptionhorizon]   
+        consumptionrate = theta(self.discountrate, wealthrate, self.risktolerance)
+        wealth = terminalwealth(self.wealth, self.income, self.consumption, **self.horizons, wealthrate=wealthrate, incomerate=incomerate, consumptionrate=consumptionrate, payments=self.payments)
         value = assetvalue(self.value, kwargs['valuerate'], self.consumptionhorizon) if self.value else 0   
-        mortgagebalance = self.mortgage.projection(self.consumptionhorizon).balance
-        studentloanbalance = self.studentloan.projection(self.consumptionhorizon).balance
-        debtbalance = self.debt.projection(self.consumptionhorizon).balance
-        return wealth + value < mortgagebalance + studentloanbalance + debtbalance
+        balances = sum([balancevalue(loan.balance, loan.rate, loan.duration, self.consumptionhorizon) for loan in self.loans.values()])
+        return bool(wealth + value < balances)
         
     def sale(self, *args, broker, **kwargs):
         if self.value == 0: return self
@@ -203,6 +201,136 @@ class Financials(ntuple('Financials', 'incomehorizon consumptionhorizon income w
         consumption = income
         if consumption <= 0: raise NegativeConsumptionError()
         return cls(*args, income=int(income), consumption=int(consumption), wealth=wealth, value=value, wealthrate=wealthrate, incomerate=incomerate, **kwargs)
+
+
+class LoanArray(ntuple('LoanArray', 'type balance rate duration')):
+    def __repr__(self): return '{}(type={}, size={})'.format(self.__class__.__name__, self.type, np.size(self.balance))
+    def __new__(cls, loantype, *args, balance, rate=0, duration=0, **kwargs):
+        balance = np.asarray(balance, dtype='float64')
+        rate = np.where(balance > 0, np.asarray(rate, dtype='float64'), 0)
+        duration = np.where(balance > 0, np.maximum(np.asarray(duration, dtype='int64'), 0), 0)
+        return super().__new__(cls, loantype, balance, rate, duration)
+
+    def __getnewargs_ex__(self): return (self.type,), dict(balance=self.balance, rate=self.rate, duration=self.duration)
+
+    @property
+    def payment(self): return paymentvalue(self.balance, self.rate, self.duration)
+    def projection(self, horizon):
+        balance = balancevalue(self.balance, self.rate, self.duration, horizon)
+        duration = np.maximum(self.duration - np.asarray(horizon, dtype='int64'), 0)
+        return self.__class__(self.type, balance=balance, rate=self.rate, duration=duration)
+
+    def select(self, index, shape=None):
+        content = {field:np.broadcast_to(getattr(self, field), shape if shape is not None else np.shape(self.balance))[index] for field in ('balance', 'rate', 'duration')}
+        return self.__class__(self.type, **content)
+    @classmethod
+    def fromloans(cls, loantype, loans):
+        content = {field:np.array([getattr(loan, field) for loan in loans]) for field in ('balance', 'rate', 'duration')}
+        return cls(loantype, **content)
+    @classmethod
+    def empty(cls, loantype, size): return cls(loantype, balance=np.zeros(size))
+
+
+class FinancialsArray(ntuple('FinancialsArray', 'incomehorizon consumptionhorizon income wealth value consumption mortgage studentloan debt discountrate risktolerance')):
+    def __repr__(self): return '{}(size={})'.format(self.__class__.__name__, self.size)
+    def __new__(cls, incomehorizon, consumptionhorizon, *args, income, wealth, value, consumption, mortgage=None, studentloan=None, debt=None, discountrate, risktolerance, **kwargs):
+        incomehorizon, consumptionhorizon = np.asarray(incomehorizon, dtype='int64'), np.asarray(consumptionhorizon, dtype='int64')
+        assets = [np.asarray(item, dtype='float64') for item in (income, wealth, value, consumption)]
+        size = np.broadcast(incomehorizon, consumptionhorizon, *assets).shape
+        mortgage = mortgage if mortgage is not None else LoanArray.empty('mortgage', size)
+        studentloan = studentloan if studentloan is not None else LoanArray.empty('studentloan', size)
+        debt = debt if debt is not None else LoanArray.empty('debt', size)
+        rates = [np.asarray(item, dtype='float64') for item in (discountrate, risktolerance)]
+        return super().__new__(cls, incomehorizon, consumptionhorizon, *assets, mortgage, studentloan, debt, *rates)
+
+    def __getnewargs_ex__(self): return (self.incomehorizon, self.consumptionhorizon), {field:getattr(self, field) for field in self._fields[2:]}
+
+    @property
+    def shape(self): return np.broadcast(self.incomehorizon, self.consumptionhorizon, self.income, self.wealth, self.value, self.consumption, *[loan.balance for loan in self.loans.values()]).shape
+    @property
+    def size(self): return int(np.prod(self.shape))
+    @property
+    def loans(self): return dict(mortgage=self.mortgage, studentloan=self.studentloan, debt=self.debt)
+    @property
+    def horizons(self): return dict(incomehorizon=self.incomehorizon, consumptionhorizon=self.consumptionhorizon)
+    @property
+    def rates(self): return dict(discountrate=self.discountrate, risktolerance=self.risktolerance)
+    @property
+    def payments(self): return [(loan.payment, loan.duration) for loan in self.loans.values()]
+    @property
+    def netwealth(self): return self.wealth - sum([loan.balance for loan in self.loans.values()])
+
+    def todict(self): return self._asdict()
+    def __getitem__(self, item):
+        if isinstance(item, (int, slice)): return super().__getitem__(item)
+        elif isinstance(item, str): return getattr(self, item)
+        else: raise TypeError(type(item).__name__)
+
+    def select(self, index):
+        content = {field:np.broadcast_to(getattr(self, field), self.shape)[index] for field in ('incomehorizon', 'consumptionhorizon', 'income', 'wealth', 'value', 'consumption', 'discountrate', 'risktolerance')}
+        loans = {key:loan.select(index, self.shape) for key, loan in self.loans.items()}
+        return self.__class__(content.pop('incomehorizon'), content.pop('consumptionhorizon'), **content, **loans)
+
+    def ponzi(self, *args, wealthrate, incomerate, **kwargs):
+        consumptionrate = theta(self.discountrate, wealthrate, self.risktolerance)
+        wealth = terminalwealth(self.wealth, self.income, self.consumption, **self.horizons, wealthrate=wealthrate, incomerate=incomerate, consumptionrate=consumptionrate, payments=self.payments)
+        value = self.value * growthvalue(kwargs['valuerate'], self.consumptionhorizon) if np.any(self.value) else 0
+        balances = sum([balancevalue(loan.balance, loan.rate, loan.duration, self.consumptionhorizon) for loan in self.loans.values()])
+        return wealth + value < balances
+
+    def projection(self, horizon, *args, wealthrate, incomerate, **kwargs):
+        horizon = np.asarray(horizon, dtype='int64')
+        assert np.all(horizon <= self.consumptionhorizon)
+        consumptionrate = theta(self.discountrate, wealthrate, self.risktolerance)
+        income = np.where(horizon <= self.incomehorizon, self.income * growthvalue(incomerate, horizon), 0)
+        consumption = self.consumption * growthvalue(consumptionrate, horizon)
+        value = self.value * growthvalue(kwargs['valuerate'], horizon) if np.any(self.value) else np.zeros_like(self.value)
+        wealth = wealthvalue(horizon, self.wealth, self.income, self.consumption, **self.horizons, wealthrate=wealthrate, incomerate=incomerate, consumptionrate=consumptionrate, payments=self.payments)
+        horizons = [np.maximum(self.incomehorizon - horizon, 0), self.consumptionhorizon - horizon]
+        loans = {key:loan.projection(horizon) for key, loan in self.loans.items()}
+        financials = self.__class__(*horizons, income=income, wealth=wealth, value=value, consumption=consumption, **loans, **self.rates)
+        return financials, ~financials.ponzi(*args, wealthrate=wealthrate, incomerate=incomerate, **kwargs)
+
+    def sale(self, *args, broker, **kwargs):
+        saleable = self.value > 0
+        proceeds = self.value - broker.cost(self.value) - self.mortgage.balance
+        assets = dict(wealth=np.where(saleable, self.wealth + proceeds, self.wealth), value=np.zeros_like(self.value))
+        flows = dict(income=self.income, consumption=self.consumption)
+        loans = dict(mortgage=None, studentloan=self.studentloan, debt=self.debt)
+        financials = self.__class__(self.incomehorizon, self.consumptionhorizon, **assets, **flows, **loans, **self.rates)
+        return financials, ~saleable | ~financials.ponzi(*args, **kwargs)
+
+    def purchase(self, values, *args, bank, **kwargs):
+        values = np.asarray(values, dtype='float64')
+        assert not np.any(self.value) and not np.any(self.mortgage.balance)
+        priced = values >= 0
+        values = np.where(priced, values, 0)
+        downpayments = bank.downpayment(values)
+        closingcosts = bank.cost(values - downpayments)
+        wealth = self.wealth - downpayments - closingcosts
+        mortgage = LoanArray(bank.type, balance=values - downpayments, rate=bank.rate, duration=bank.duration)
+        with np.errstate(divide='ignore', invalid='ignore'): 
+            covered = ~(self.income / (mortgage.payment + self.studentloan.payment + self.debt.payment) < bank.coverage)
+        assets = dict(wealth=wealth, value=values)
+        flows = dict(income=self.income, consumption=self.consumption)
+        loans = dict(mortgage=mortgage, studentloan=self.studentloan, debt=self.debt)
+        financials = self.__class__(self.incomehorizon, self.consumptionhorizon, **assets, **flows, **loans, **self.rates)
+        return financials, priced & (wealth >= 0) & covered & ~financials.ponzi(*args, **kwargs)
+
+    @classmethod
+    def fromfinancials(cls, financials):
+        assert all([isinstance(financial, Financials) for financial in financials])
+        content = {field:np.array([getattr(financial, field) for financial in financials]) for field in ('incomehorizon', 'consumptionhorizon', 'income', 'wealth', 'value', 'consumption', 'discountrate', 'risktolerance')}
+        loans = {key:LoanArray.fromloans(key, [getattr(financial, key) for financial in financials]) for key in ('mortgage', 'studentloan', 'debt')}
+        return cls(content.pop('incomehorizon'), content.pop('consumptionhorizon'), **content, **loans)
+
+    @classmethod
+    def create(cls, *args, date, income, wealth=0, value=0, economy, **kwargs):
+        wealthrate = economy.wealthrate(date.year, units='month') 
+        incomerate = economy.incomerate(date.year, units='month')
+        income = np.floor(np.asarray(income, dtype='float64'))
+        financials = cls(*args, income=income, consumption=income, wealth=wealth, value=value, **kwargs)
+        return financials, (financials.consumption > 0) & ~financials.ponzi(wealthrate=wealthrate, incomerate=incomerate, **kwargs)
         
     
     
@@ -14,12 +14,14 @@ from utilities.dispatchers import clskey_singledispatcher as keydispatcher
 from utilities.strings import uppercase
 from utilities.utility import NumericalError
 
+from realestate.economy import Loan
+from realestate.caches import InstanceKey, InstanceCache, ColumnTable, scopedcache
 from realestate.finance import Financials, UnstableLifeStyleError, NegativeConsumptionError, InsufficientFundsError, InsufficientCoverageError
 from realestate.utility import Household_UtilityFunction
 
 __version__ = "1.0.0"
 __author__ = "Jack Kirby Cook"
-__all__ = ['Household']
+__all__ = ['Household', 'HouseholdTable']
 __copyright__ = "Copyright 2020, Jack Kirby Cook"
 __license__ = ""
 
@@ -29,8 +31,10 @@ class DeceasedHouseholderError(Exception): pass
 
 
 def createHouseholdKey(*args, date, age, parameters, financials, utility, **kwargs):
-    parameters = [hash((key, hash(value),)) for key, value in parameters.items()]
-    return (hash(date), hash(age), *parameters, hash(financials.key), hash(utility.key),)
+    return InstanceKey((date, age, tuple(parameters.items()), financials.key, utility.key,))
+
+
+class HouseholdTable(ColumnTable, dtypes={'count':'int64', 'age':'int64', 'income':'float64', 'consumption':'float64', 'netwealth':'float64'}): pass
 
 
 class Household(ntuple('Household', 'date age parameters financials utility')):
@@ -38,9 +42,20 @@ class Household(ntuple('Household', 'date age parameters financials utility')):
     __parameters = tuple()
 
     @classmethod
-    def clear(cls): cls.__instances = {}    
+    def clear(cls): 
+        cls.__instances.clear()
+        Loan.clear()
+    @classmethod
+    def swapcache(cls, cache): 
+        previous, cls.__instances = cls.__instances, cache
+        return previous
+    @classmethod
+    def scope(cls, maxsize=None): return scopedcache(cls, InstanceCache(maxsize=maxsize, table=HouseholdTable))
+    @classmethod
+    def statistics(cls): return cls.__instances.statistics    
     @classmethod
     def customize(cls, *args, **kwargs):
+        cls.__instances = kwargs.get('cache', cls.__instances)
         cls.clear()
         cls.__parameters = kwargs.get('parameters', cls.__parameters)
         cls.__lifetimes = kwargs.get('lifetimes', cls.__lifetimes)   
@@ -50,31 +65,33 @@ class Household(ntuple('Household', 'date age parameters financials utility')):
         content.update({key:repr(value) for key, value in self.parameters.items()})
         return '{}({})'.format(self.__class__.__name__, ', '.join(['='.join([key, value]) for key, value in content.items()]))
 
-    __instances = {}       
+    __instances = InstanceCache(table=HouseholdTable)       
+    @property
+    def row(self): return self.__row
     @property
-    def count(self): return self.__count    
+    def count(self): return int(self.__table.get(self.__row, 'count'))
     def __new__(cls, *args, date, age, parameters, financials, utility, **kwargs):
         if age < cls.__lifetimes['adulthood']: raise PrematureHouseholderError()
         if age > cls.__lifetimes['death']: raise DeceasedHouseholderError()              
-        key = hash(createHouseholdKey(*args, date=date, age=age, parameters=parameters, financials=financials, utility=utility, **kwargs))
+        parameters = {parameter:parameters[parameter] for parameter in cls.__parameters}
+        key = createHouseholdKey(*args, date=date, age=age, parameters=parameters, financials=financials, utility=utility, **kwargs)
         try: return cls.__instances[key]
         except KeyError: 
-            parameters = {parameter:parameters[parameter] for parameter in cls.__parameters}
             newinstance = super().__new__(cls, date=date, age=age, parameters=parameters, financials=financials, utility=utility)
+            newinstance.__key, newinstance.__table = key, cls.__instances.table
+            newinstance.__row = cls.__instances.restore(key, **newinstance.toContent())
             cls.__instances[key] = newinstance
             return newinstance
     
-    def __init__(self, *args, count=1, **kwargs):                    
-        try: self.__count = self.__count + count
-        except AttributeError: self.__count = count
+    def __init__(self, *args, count=1, **kwargs): self.__table.add(self.__row, 'count', count)
      
     def __call__(self, housing, *args, tenure, filtration, **kwargs):
         try: spending = self.spending(tenure, housing, *args, **kwargs)
-        except (UnstableLifeStyleError, NegativeConsumptionError, InsufficientFundsError, InsufficientCoverageError): return np.NaN, np.NaN
+        except (UnstableLifeStyleError, NegativeConsumptionError, InsufficientFundsError, InsufficientCoverageError): return np.nan, np.nan
         try: 
             utility = self.utility(*args, housing=housing, household=self, spending=spending, **kwargs)
             derivative = self.utility.derivative(filtration, *args, housing=housing, household=self, spending=spending, **kwargs)
-        except NumericalError: return np.NaN, np.NaN
+        except NumericalError: return np.nan, np.nan
         return utility, derivative       
      
     @keydispatcher
@@ -92,7 +109,8 @@ class Household(ntuple('Household', 'date age parameters financials utility')):
         return newfinancials.consumption - housingcost
     
     @property
-    def key(self): return createHouseholdKey(**self.todict())   
+    def key(self): return self.__key
+    def __hash__(self): return hash(self.__key)
     def __ne__(self, other): return not self.__eq__(other)
     def __eq__(self, other): 
         assert isinstance(other, type(self))
@@ -106,15 +124,15 @@ class Household(ntuple('Household', 'date age parameters financials utility')):
         try: return self.parameters[attr]
         except KeyError: raise AttributeError(attr)
 
-    def toSeries(self):
-        content = {'count':self.count, 'age':self.age, **{key:value for key, value in self.parameters.items()}}
+    def toContent(self):
+        content = {'age':self.age, **{key:value for key, value in self.parameters.items()}}
         content.update({'income':self.financials.income, 'consumption':self.financials.consumption, 'netwealth':self.financials.netwealth})
-        series = pd.Series(content)
-        return series
+        return content
+    def toSeries(self): return pd.Series({'count':self.count, **self.toContent()})
 
     @classmethod
     def table(cls):
-        dataframe = pd.concat([household.toSeries() for household in cls.__instances.values()], axis=1).transpose()
+        dataframe = cls.__instances.table.dataframe()
         dataframe.columns = [uppercase(column) for column in dataframe.columns]
         dataframe.index.name = 'Households'
         return dataframe
@@ -6,6 +6,7 @@ Created on Sun Feb 23 2020
 
 """
 
+import numpy as np
 import pandas as pd
 from collections import namedtuple as ntuple
 
@@ -13,17 +14,21 @@ from utilities.dispatchers import clskey_singledispatcher as keydispatcher
 from utilities.strings import uppercase
 from utilities.concepts import concept
 
+from realestate.caches import InstanceKey, InstanceCache, ColumnTable, scopedcache
+
 __version__ = "1.0.0"
 __author__ = "Jack Kirby Cook"
-__all__ = ['Housing']
+__all__ = ['Housing', 'HousingTable']
 __copyright__ = "Copyright 2020, Jack Kirby Cook"
 __license__ = ""
 
 
 def createHousingKey(*args, geography, date, parameters={}, concepts={}, **kwargs):
-    parameters = [hash((key, hash(value),)) for key, value in parameters.items()]    
-    concepts = [hash((key, hash(value),)) for key, value in concepts.items()]
-    return (hash(geography), hash(date), *parameters, *concepts,)
+    return InstanceKey((geography, date, tuple(parameters.items()), tuple(concepts.items()),))
+
+
+_parameteraccessor = lambda attr: lambda housing: housing.parameters[attr]
+_conceptaccessor = lambda key, attr: lambda housing: getattr(housing.concepts[key], attr)
 
 
 Crime = concept('crime', ['incomelevel', 'race', 'education', 'unit'])
@@ -34,41 +39,68 @@ Space = concept('space', ['unit', 'bedrooms', 'rooms', 'sqft'])
 Quality = concept('quality', ['yearbuilt'])
 
 
+class HousingTable(ColumnTable, dtypes={'count':'int64', 'geography':'object', 'price':'float64', 'rent':'float64', 'cost':'float64'}): pass
+
+
 class Housing(ntuple('Housing', 'geography date parameters concepts')):
     __parameters = tuple()
     __concepts = dict()    
+    __resolutions = dict()
 
     @classmethod
-    def clear(cls): cls.__instances = {}
+    def clear(cls): cls.__instances.clear()
+    @classmethod
+    def swapcache(cls, cache): 
+        previous, cls.__instances = cls.__instances, cache
+        return previous
+    @classmethod
+    def scope(cls, maxsize=None): return scopedcache(cls, InstanceCache(maxsize=maxsize, table=HousingTable))
+    @classmethod
+    def statistics(cls): return cls.__instances.statistics
     @classmethod
     def customize(cls, *args, **kwargs):
+        cls.__instances = kwargs.get('cache', cls.__instances)
         cls.clear()
         cls.__parameters = kwargs.get('parameters', cls.__parameters)
         cls.__concepts = kwargs.get('concepts', cls.__concepts)
+        cls.compile()
+
+    @classmethod
+    def compile(cls):
+        resolutions = {attr:('parameters', _parameteraccessor(attr)) for attr in cls.__parameters}
+        for key, Concept in cls.__concepts.items():
+            for attr in getattr(Concept, '_fields', tuple()): resolutions.setdefault(attr, ('concepts', _conceptaccessor(key, attr)))
+        cls.__resolutions = resolutions
+    @classmethod
+    def resolutions(cls): return {attr:source for attr, (source, accessor) in cls.__resolutions.items()}
 
     def __repr__(self): 
         content = {'date':repr(self.date), 'geography':repr(self.geography)} 
-        content.update({'rent':str(self.__rent), 'price':str(self.__price), 'cost':str(self.__cost)})
+        content.update({'rent':str(self.rentercost), 'price':str(self.purchaseprice), 'cost':str(self.ownercost)})
         content.update({key:repr(value) for key, value in self.parameters.items()})
         content.update({key:repr(value) for key, value in self.concepts.items()})
         return '{}({})'.format(self.__class__.__name__, ', '.join(['='.join([key, value]) for key, value in content.items()]))
 
-    __instances = {}      
+    __instances = InstanceCache(table=HousingTable)      
     @property
-    def count(self): return self.__count
+    def row(self): return self.__row
+    @property
+    def count(self): return int(self.__table.get(self.__row, 'count'))
     def __new__(cls, *args, date, geography, parameters, concepts, **kwargs):   
-        key = hash(createHousingKey(geography=geography, date=date, parameters=parameters, concepts=concepts))
+        key = createHousingKey(geography=geography, date=date, parameters=parameters, concepts=concepts)
         try: return cls.__instances[key]
         except KeyError:
             newinstance = super().__new__(cls, geography=geography, date=date, parameters=parameters, concepts=concepts)
+            newinstance.__key, newinstance.__table = key, cls.__instances.table
+            newinstance.__row = cls.__instances.restore(key, geography=geography.geoID, **parameters)
             cls.__instances[key] = newinstance
             return newinstance
 
     def __init__(self, *args, count=1, date, price, rent, cost, rentrate, valuerate, **kwargs): 
-        try: self.__count = self.__count + count
+        self.__table.add(self.__row, 'count', count)
+        try: self.__valuerate, self.__rentrate
         except (AttributeError, KeyError): 
-            self.__count = count 
-            self.__rent, self.__price, self.__cost = rent, price, cost 
+            for column, value in dict(rent=rent, price=price, cost=cost).items(): self.__table.set(self.__row, column, value)
             self.__valuerate = valuerate(date.year, units='month')
             self.__rentrate = rentrate(date.year, units='month')           
          
@@ -78,24 +110,37 @@ class Housing(ntuple('Housing', 'geography date parameters concepts')):
     @keydispatcher
     def updateprice(self, tenure, price, *args, **kwargs): raise KeyError(tenure) 
     @updateprice.register('renter')
-    def updateprice_renter(self, price, *args, **kwargs): self.__rent = price
+    def updateprice_renter(self, price, *args, **kwargs): self.__table.set(self.__row, 'rent', price)
     @updateprice.register('owner')
-    def updatepricee_owner(self, price, *args, **kwargs): self.__price = price  
+    def updatepricee_owner(self, price, *args, **kwargs): self.__table.set(self.__row, 'price', price)  
     
     def todict(self): return self._asdict()
     def __getitem__(self, item): 
         if not isinstance(item, str): return super().__getitem__(item)
         else: return getattr(self, item)    
     def __getattr__(self, attr): 
-        try: return self.parameters[attr]
-        except KeyError: 
-            for key, value in self.concepts.items():
-                try: return getattr(value, attr)
-                except AttributeError: pass
-            raise AttributeError(attr)                
+        try: source, accessor = self.__resolutions[attr]
+        except KeyError: source, accessor = self.__resolve(attr)
+        try: return accessor(self)
+        except (KeyError, AttributeError): raise AttributeError(attr)
+
+    def __resolve(self, attr):
+        if attr in self.parameters: resolution = ('parameters', _parameteraccessor(attr))
+        else: 
+            keys = [key for key, value in self.concepts.items() if hasattr(value, attr)]
+            if not keys: raise AttributeError(attr)
+            resolution = ('concepts', _conceptaccessor(keys[0], attr))
+        self.__resolutions[attr] = resolution
+        return resolution
+
+    @classmethod
+    def materialize(cls, *attrs, housings=None):
+        housings = cls.__instances.values() if housings is None else housings
+        return {attr:np.array([housing[attr] for housing in housings], dtype='float64') for attr in attrs}
     
     @property
-    def key(self): return createHousingKey(**self.todict())  
+    def key(self): return self.__key
+    def __hash__(self): return hash(self.__key)
     def __ne__(self, other): return not self.__eq__(other)
     def __eq__(self, other): 
         assert isinstance(other, type(self))
@@ -107,29 +152,29 @@ class Housing(ntuple('Housing', 'geography date parameters concepts')):
     def rentrate(self): return self.__rentrate    
     
     @property
-    def purchaseprice(self): return self.__price    
+    def purchaseprice(self): return float(self.__table.get(self.__row, 'price'))
     @property
-    def ownercost(self): return self.__cost    
+    def ownercost(self): return float(self.__table.get(self.__row, 'cost'))
     @property
-    def rentercost(self): return self.__rent 
+    def rentercost(self): return float(self.__table.get(self.__row, 'rent'))
 
     @keydispatcher
     def price(self, tenure): raise KeyError(tenure)
     @price.register('renter', 'rent')
-    def priceRenter(self): return self.__rent
+    def priceRenter(self): return self.rentercost
     @price.register('owner', 'own')
-    def priceOwner(self): return self.__price
+    def priceOwner(self): return self.purchaseprice
 
     def toSeries(self):
         content = {'count':self.count, 'geography':self.geography.geoID} 
         content.update({key:value for key, value in self.parameters.items()})
-        content.update({'price':self.__price, 'rent':self.__rent})
+        content.update({'price':self.purchaseprice, 'rent':self.rentercost})
         series = pd.Series(content)
         return series
       
     @classmethod 
     def table(cls, tenure=None):
-        dataframe = pd.concat([housing.toSeries() for housing in cls.__instances.values()], axis=1).transpose()
+        dataframe = cls.__instances.table.dataframe([column for column in cls.__instances.table.columns if column != 'cost'])
         if tenure == 'renter': dataframe.drop('price', axis=1, inplace=True)
         elif tenure == 'owner': dataframe.drop('rent', axis=1, inplace=True)
         else: pass
@@ -7,6 +7,19 @@ Created on Mon May 18 2020
 """
 
 import numpy as np
+from collections import namedtuple as ntuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from scipy.sparse import csr_matrix, issparse
+
+from utilities.dispatchers import clskey_singledispatcher as keydispatcher
+from utilities.dispatchers import key_singledispatcher
+
+from realestate.economy import paymentvalue
+from realestate.finance import FinancialsArray
+from realestate.housing import Housing
+from realestate.cohorts import Household_Cohorts, Housing_Cohorts
+from realestate.utility import habitationkernel, habitationpairs, householdkernel
 
 __version__ = "1.0.0"
 __author__ = "Jack Kirby Cook"
@@ -23,6 +36,109 @@ _diffnormalize = lambda x: (np.nansum(x) - x) / (np.nansum(x)**2)
 _minmax = lambda x: (x - np.nanmin(x)) / (np.nanmax(x) - np.nanmin(x))
 _summation = lambda x: np.nansum(x)
 _logdiff = lambda x, xmin, xmax: np.log10(np.clip(x, 0.1, 10))
+_column = lambda items, function: np.array([function(item) for item in items], dtype='float64')
+_norm = lambda x: float(np.linalg.norm(np.nan_to_num(x)))
+_maxlogstep = np.log(2)
+
+
+@key_singledispatcher
+def createspendings(tenure, financials, housings, *args, **kwargs): raise KeyError(tenure)
+@createspendings.register('renter')
+def createspendings_renter(financials, housings, *args, **kwargs):
+    spendings = financials.consumption - housings['rent']
+    return spendings, np.ones(spendings.shape, dtype=bool)
+@createspendings.register('owner')
+def createspendings_owner(financials, housings, *args, **kwargs):
+    financials, feasible = financials.purchase(housings['price'], *args, **kwargs)
+    spendings = financials.consumption - housings['cost'] - financials.mortgage.payment
+    return spendings, feasible
+
+
+@key_singledispatcher
+def createceilings(tenure, financials, solvent, *args, **kwargs): raise KeyError(tenure)
+@createceilings.register('renter')
+def createceilings_renter(financials, solvent, *args, **kwargs): 
+    return np.where(solvent, np.nan_to_num(financials.consumption, nan=-np.inf), -np.inf)
+@createceilings.register('owner')
+def createceilings_owner(financials, solvent, *args, bank, **kwargs):
+    financing = (1 - bank.loantovalue) + bank.loantovalue * bank.financing
+    servicing = bank.loantovalue * float(paymentvalue(1, bank.rate, bank.duration))
+    obligations = financials.studentloan.payment + financials.debt.payment
+    with np.errstate(divide='ignore', invalid='ignore'):
+        funds = financials.wealth / financing if financing > 0 else np.full(financials.shape, np.inf)
+        coverage = (financials.income / bank.coverage - obligations) / servicing if bank.coverage > 0 and servicing > 0 else np.full(financials.shape, np.inf)
+    ceilings = np.nan_to_num(np.minimum(funds, coverage), nan=-np.inf)
+    return np.where(solvent, ceilings + np.abs(ceilings) * 1e-9, -np.inf)
+
+
+def createpairs(prices, ceilings):
+    order = np.argsort(prices, kind='stable')
+    counts = np.searchsorted(prices[order], ceilings, side='right')
+    starts = np.cumsum(counts) - counts
+    columns = np.repeat(np.arange(len(ceilings)), counts)
+    rows = order[np.arange(np.sum(counts)) - np.repeat(starts, counts)]
+    return rows, columns
+
+
+def createhabitations(households, housings, kernel):
+    concepts = {key:housings[key] for key in ('location', 'quality', 'space')}
+    weights = {key:households['habitation_' + key] for key in ('location', 'quality', 'space')}
+    amplitude, diminishrate, elasticity = [households['habitation_' + key] for key in ('amplitude', 'diminishrate', 'elasticity')]
+    return kernel(concepts, weights, amplitude, diminishrate, elasticity)
+
+
+def createutilitys(households, habitations, consumptions, feasible):
+    weights = {key:households[key] for key in ('habitation', 'consumption')}
+    uMatrix, duMatrix = householdkernel(habitations, consumptions, weights, households['amplitude'], households['diminishrate'])
+    return np.where(feasible, uMatrix, np.nan), np.where(feasible, duMatrix, np.nan)
+
+
+def evaluateblock(tenure, baseline, housings, rows, *args, **kwargs):
+    housings = {key:values[:, np.newaxis] for key, values in housings.items()}
+    spendings, feasible = createspendings(tenure, baseline['financials'], housings, *args, **kwargs)
+    feasible = feasible & baseline['solvent'][np.newaxis, :]
+    return createutilitys(baseline['households'], baseline['habitations'][rows], spendings / baseline['cpi'], feasible)
+
+
+def evaluatepairs(tenure, baseline, housings, rows, columns, *args, **kwargs):
+    households = {key:values[columns] for key, values in baseline['households'].items() if key != 'financials'}
+    housings = {key:values[rows] for key, values in housings.items()}
+    spendings, feasible = createspendings(tenure, baseline['financials'].select(columns), housings, *args, **kwargs)
+    feasible = feasible & baseline['solvent'][columns]
+    habitations = createhabitations(households, housings, habitationpairs) / baseline['hpi']
+    uValues, duValues = createutilitys(households, habitations, spendings / baseline['cpi'], feasible)
+    return np.ravel(uValues), np.ravel(duValues)
+
+
+def selectbaseline(baseline, columns):
+    households = {key:(values.select(columns) if key == 'financials' else values[columns]) for key, values in baseline['households'].items()}
+    selection = dict(households=households, financials=baseline['financials'].select(columns), solvent=baseline['solvent'][columns], cpi=baseline['cpi'])
+    if 'habitations' in baseline: selection['habitations'] = baseline['habitations'][:, columns]
+    return selection
+
+
+class UtilityStream(ntuple('UtilityStream', 'housings results')): 
+    def __repr__(self): return '{}(housings={}, results={})'.format(self.__class__.__name__, len(list(self.housings.values())[0]), list(self.results.keys()))
+    def __new__(cls, housings): return super().__new__(cls, housings, {})
+
+
+def minibatchschedule(step, residual, initial, minimum=0.05, growth=1.05):
+    floor = minimum * np.power(growth, step)
+    if not residual or not initial: return float(np.clip(floor, minimum, 1))
+    return float(np.clip(max(1 - residual / initial, floor), minimum, 1))
+
+
+_worker = {}
+
+def _initializeworker(tenure, blocks, names, shape, dtype, kwargs):
+    memorys = [SharedMemory(name=name) for name in names]
+    uMatrix, duMatrix = [np.ndarray(shape, dtype=dtype, buffer=memory.buf) for memory in memorys]
+    _worker.update(tenure=tenure, blocks=blocks, memorys=memorys, uMatrix=uMatrix, duMatrix=duMatrix, kwargs=kwargs)
+
+def _evaluateworker(index, housings, rows):
+    columns, baseline = _worker['blocks'][index]
+    uMatrix, duMatrix = evaluateblock(_worker['tenure'], baseline, housings, rows, **_worker['kwargs'])
+    _worker['uMatrix'][rows, columns], _worker['duMatrix'][rows, columns] = uMatrix, duMatrix
 
 
 class Personal_Property_Market(object):
@@ -34,30 +150,161 @@ class Personal_Property_Market(object):
     def k(self): return len(self.__housings)
     @property
     def shape(self): return (self.j, self.i, self.k)
+    @property
+    def iterations(self): return len(self.__residuals)
+    @property
+    def residuals(self): return list(self.__residuals)
+    @property
+    def residual(self): return self.__residuals[-1] if self.__residuals else None
+    @property
+    def levels(self): return list(self.__levels)
     
-    def __init__(self, tenure, *args, households=[], housings=[], stepsize=0.1, maxsteps=500, history, dampener, converger, **kwargs):
+    def __init__(self, tenure, *args, households=[], housings=[], stepsize=0.1, maxsteps=500, evaluation='vectorized', incremental=True, tolerance=0, workers=None, executor=ProcessPoolExecutor, blocksize=1024, dtype='float64', solver='tatonnement', linesearch=10, multigrid=[], components=None, levelsteps=None, minreduction=2, refiner='tatonnement', schedule=minibatchschedule, seed=None, history, dampener, converger, **kwargs):
         assert isinstance(households, list) and isinstance(housings, list)
         assert tenure == 'renter' or tenure == 'owner'
         assert stepsize < 1
+        assert refiner not in ('multigrid', 'minibatch')
+        assert solver != 'multigrid' or callable(components)
         self.__households, self.__housings, self.__tenure = households, housings, tenure
+        self.__evaluation, self.__solver, self.__linesearch = evaluation, solver, linesearch
+        self.__incremental, self.__tolerance, self.__cache = incremental, tolerance, {}
+        self.__workers, self.__executor = workers, executor
+        self.__blocksize, self.__dtype = int(blocksize), np.dtype(dtype)
+        self.__multigrid, self.__components, self.__refiner, self.__levels = list(multigrid), components, refiner, []
+        self.__levelsteps, self.__minreduction = int(levelsteps) if levelsteps is not None else max(maxsteps // 10, 1), minreduction
+        self.__schedule, self.__seed = schedule, seed
+        self.__options = dict(stepsize=stepsize, maxsteps=maxsteps, evaluation=evaluation, incremental=incremental, tolerance=tolerance, workers=workers, executor=executor, blocksize=blocksize, dtype=dtype, linesearch=linesearch)
         self.__maxsteps, self.__stepsize = maxsteps, stepsize  
         self.__history, self.__dampener, self.__converger = history, dampener, converger
+        self.__residuals = []
         supplys, demands, prices = self.execute(*args, **kwargs)
+        self.__release()
         self.__history(prices)
         self.__converger(supplys-demands, self.__history.data)
 
     def __call__(self, *args, **kwargs): 
+        self.__residuals = []
+        self.__release()
+        try: self.solve(self.__solver, *args, **kwargs)
+        finally: self.__release()
+        self.__update(self.__converger.value)     
+
+    def __report(self, step, excess):
+        self.__residuals.append(_norm(excess))
+        print('Market Converging: {}, Residual: {:.3f}'.format(step, self.__residuals[-1]))
+
+    @keydispatcher
+    def solve(self, solver, *args, **kwargs): raise KeyError(solver)
+    @solve.register('tatonnement')
+    def solve_tatonnement(self, *args, **kwargs):
         for step in range(self.__maxsteps):           
             if bool(self.__converger): break
-            print('Market Converging: {}'.format(step))              
             supplys, demands, prices = self.execute(*args, **kwargs)      
-            steps = self.__dampener(self.__history.data) * self.__stepsize
-            dPP = np.log10(np.clip(demands / supplys, 0.1, 10)) * steps
-            prices = prices * (1 + dPP)
+            self.__report(step, demands - supplys)
+            prices = self.__tatonnement(prices, supplys, demands)
             self.__history(prices)
             self.__update(prices, *args, **kwargs) 
             self.__converger(supplys-demands, self.__history.data)
-        self.__update(self.__converger.value)     
+    @solve.register('multigrid')
+    def solve_multigrid(self, *args, **kwargs):
+        self.__levels = []
+        for level, bins in enumerate(self.__multigrid):
+            households, housings = Household_Cohorts(bins=bins)(self.__households), Housing_Cohorts(bins=bins)(self.__housings)
+            reduction = (self.i * self.j) / max(housings.cohorts * households.cohorts, 1)
+            if reduction < self.__minreduction:
+                self.__levels.append(dict(level=level, housings=housings.cohorts, households=households.cohorts, reduction=reduction, steps=0, residual=None))
+                print('Market Level: {}, Housings: {}, Households: {}, Reduction: {:.1f}x, Skipped'.format(level, housings.cohorts, households.cohorts, reduction))
+                continue
+            components = {key:value for key, value in self.__components(level).items() if key in ('history', 'dampener', 'converger')}
+            options = dict(self.__options, maxsteps=self.__levelsteps)
+            market = self.__class__(self.__tenure, *args, households=households.representatives, housings=housings.representatives, solver=self.__refiner, **options, **components, **kwargs)
+            coarseprices = market.prices(*args, **kwargs)
+            market(*args, **kwargs)
+            with np.errstate(divide='ignore', invalid='ignore'): ratios = np.where(coarseprices > 0, market.prices(*args, **kwargs) / coarseprices, 1)
+            prices = self.prices(*args, **kwargs) * np.nan_to_num(ratios, nan=1)[housings.assignments]
+            self.__update(prices, *args, **kwargs)
+            self.__history(prices)
+            self.__levels.append(dict(level=level, housings=market.i, households=market.j, reduction=reduction, steps=market.iterations, residual=market.residual))
+            print('Market Level: {}, Housings: {}, Households: {}, Reduction: {:.1f}x, Steps: {}, Residual: {}'.format(level, market.i, market.j, reduction, market.iterations, market.residual))
+        self.solve(self.__refiner, *args, **kwargs)
+    @solve.register('minibatch')
+    def solve_minibatch(self, *args, **kwargs):
+        generator = np.random.default_rng(self.__seed)
+        weights = np.array([household.count for household in self.__households], dtype='float64')
+        residual, initial = None, None
+        for step in range(self.__maxsteps):
+            size = int(np.ceil(self.__schedule(step, residual, initial) * self.j))
+            if size >= self.j: break
+            columns = generator.choice(self.j, size=max(size, 1), p=weights / np.sum(weights))
+            supplys, demands, prices = self.supplys(*args, **kwargs), self.sampledemands(columns, *args, **kwargs), self.prices(*args, **kwargs)
+            self.__report(step, demands - supplys)
+            residual = self.__residuals[-1]
+            initial = residual if initial is None else initial
+            prices = self.__tatonnement(prices, supplys, demands)
+            self.__history(prices)
+            self.__update(prices, *args, **kwargs)
+        self.__release()
+        self.solve(self.__refiner, *args, **kwargs)
+
+    def sampledemands(self, columns, *args, **kwargs):
+        if not self.__cache: self.__cache = self.samplebaseline(*args, **kwargs)
+        cache = self.__cache
+        weights = np.array([household.count for household in self.__households], dtype='float64')
+        columns, multiplicity = np.unique(columns, return_counts=True)
+        block = selectbaseline(cache, columns)
+        housings = {**cache['housings'], **self.housingprices(*args, **kwargs)}
+        habitations = self.habitations(block['households'], housings, *args, **kwargs) / cache['hpi']
+        uBlock, _ = evaluateblock(self.__tenure, dict(block, habitations=habitations), housings, slice(None), *args, **kwargs)
+        totals = np.sum(np.nan_to_num(uBlock), axis=0)
+        with np.errstate(divide='ignore'): inverses = np.where(totals > 0, 1 / totals, 0)
+        return np.nan_to_num(uBlock) @ (multiplicity * inverses) * (np.sum(weights) / np.sum(multiplicity))
+
+    def samplebaseline(self, *args, economy, date, **kwargs):
+        baseline = self.basearrays(*args, economy=economy, date=date, precompute=False, **kwargs)
+        return dict(**baseline, hpi=economy.hpi(date), executor=None, blocks=[], memorys=[])
+
+    @solve.register('newton')
+    def solve_newton(self, *args, **kwargs): self.__newton(*args, broyden=False, **kwargs)
+    @solve.register('broyden')
+    def solve_broyden(self, *args, **kwargs): self.__newton(*args, broyden=True, **kwargs)
+
+    def __newton(self, *args, broyden, **kwargs):
+        prices, supplys = self.prices(*args, **kwargs), self.supplys(*args, **kwargs)
+        excess, uMatrix, duMatrix = self.__trial(prices, supplys, *args, **kwargs)
+        jacobian = self.elasticitys(*args, uMatrix=uMatrix, duMatrix=duMatrix, **kwargs)
+        for step in range(self.__maxsteps):
+            if bool(self.__converger): break
+            self.__report(step, excess)
+            fallback = self.__tatonnement(prices, supplys, excess + supplys)
+            fallbackexcess, _, _ = self.__trial(fallback, supplys, *args, **kwargs)
+            direction = np.linalg.lstsq(jacobian * prices, -excess, rcond=None)[0]
+            direction, alpha, accepted = np.clip(np.nan_to_num(direction), -_maxlogstep, _maxlogstep), 1, False
+            for search in range(self.__linesearch):
+                newprices = prices * np.exp(alpha * direction)
+                newexcess, uMatrix, duMatrix = self.__trial(newprices, supplys, *args, **kwargs)
+                accepted = _norm(newexcess) <= min((1 - 1e-4 * alpha) * _norm(excess), _norm(fallbackexcess))
+                if accepted: break
+                alpha = alpha / 2
+            if not accepted: 
+                newprices = fallback
+                newexcess, uMatrix, duMatrix = self.__trial(newprices, supplys, *args, **kwargs)
+            if broyden and accepted: 
+                dp, dz = newprices - prices, newexcess - excess
+                jacobian = jacobian + np.outer(dz - jacobian @ dp, dp) / max(dp @ dp, np.finfo(float).eps)
+            else: jacobian = self.elasticitys(*args, uMatrix=uMatrix, duMatrix=duMatrix, **kwargs)
+            prices, excess = newprices, newexcess
+            self.__history(prices)
+            self.__converger(-excess, self.__history.data)
+
+    def __trial(self, prices, supplys, *args, **kwargs):
+        self.__update(prices, *args, **kwargs)
+        uMatrix, duMatrix = self.evaluate(*args, **kwargs)
+        return self.demands(*args, uMatrix=uMatrix, **kwargs) - supplys, uMatrix, duMatrix
+
+    def __tatonnement(self, prices, supplys, demands):
+        steps = self.__dampener(self.__history.data) * self.__stepsize
+        dPP = np.log10(np.clip(demands / supplys, 0.1, 10)) * steps
+        return prices * (1 + dPP)
         
     def __update(self, prices, *args, **kwargs): 
         for price, housing in zip(prices, self.__housings): housing(price, *args, tenure=self.__tenure, **kwargs)      
@@ -69,65 +316,174 @@ class Personal_Property_Market(object):
         demands = self.demands(*args, uMatrix=uMatrix, **kwargs)
         return supplys, demands, prices
 
-    def evaluate(self, *args, **kwargs):
+    def evaluate(self, *args, **kwargs): return self.evaluation(self.__evaluation, *args, **kwargs)
+
+    @keydispatcher
+    def evaluation(self, method, *args, **kwargs): raise KeyError(method)
+    @evaluation.register('iterated')
+    def evaluation_iterated(self, *args, **kwargs):
         uMatrix = np.empty((len(self.__housings), len(self.__households),)) 
         duMatrix = np.empty((len(self.__housings), len(self.__households),))
-        uMatrix[:], duMatrix[:] = np.NaN, np.NaN
+        uMatrix[:], duMatrix[:] = np.nan, np.nan
         for i, housing in enumerate(self.__housings):
             for j, household in enumerate(self.__households):
                 uMatrix[i, j], duMatrix[i, j] = household(housing, *args, tenure=self.__tenure, filtration='consumption', **kwargs)
         return uMatrix, duMatrix    
+    @evaluation.register('vectorized')
+    def evaluation_vectorized(self, *args, **kwargs):
+        if not self.__cache: self.__cache = self.baseline(*args, **kwargs)
+        cache = self.__cache
+        housings = {**cache['housings'], **self.housingprices(*args, **kwargs)}
+        prices = housings['rent'] if self.__tenure == 'renter' else housings['price']
+        if not self.__incremental: changed = np.ones(self.i, dtype=bool)
+        else: changed = ~np.isclose(prices, cache['prices'], rtol=self.__tolerance, atol=0)
+        if np.any(changed):
+            rows = np.flatnonzero(changed)
+            housings = {key:values[rows] for key, values in housings.items()}
+            if cache['executor'] is not None: 
+                futures = [cache['executor'].submit(_evaluateworker, index, housings, rows) for index in range(len(cache['blocks']))]
+                for future in futures: future.result()
+            else: cache['uMatrix'][rows], cache['duMatrix'][rows] = evaluateblock(self.__tenure, cache, housings, rows, *args, **kwargs)
+            cache['prices'][rows] = prices[rows]
+        return cache['uMatrix'], cache['duMatrix']
+    @evaluation.register('sparse')
+    def evaluation_sparse(self, *args, **kwargs):
+        if not self.__cache: self.__cache = self.prefilter(*args, **kwargs)
+        cache = self.__cache
+        housings = {**cache['housings'], **self.housingprices(*args, **kwargs)}
+        prices = housings['rent'] if self.__tenure == 'renter' else housings['price']
+        rows, columns = createpairs(prices, cache['ceilings'])
+        uValues, duValues = evaluatepairs(self.__tenure, cache, housings, rows, columns, *args, **kwargs)
+        feasible = np.isfinite(uValues) & np.isfinite(duValues)
+        rows, columns = rows[feasible], columns[feasible]
+        uMatrix, duMatrix = [csr_matrix((values[feasible], (rows, columns)), shape=(self.i, self.j)) for values in (uValues, duValues)]
+        return uMatrix, duMatrix
+    @evaluation.register('streaming')
+    def evaluation_streaming(self, *args, **kwargs):
+        if not self.__cache: self.__cache = self.streambaseline(*args, **kwargs)
+        stream = UtilityStream({**self.__cache['housings'], **self.housingprices(*args, **kwargs)})
+        return stream, stream
+
+    def streambaseline(self, *args, economy, date, **kwargs):
+        baseline = self.basearrays(*args, economy=economy, date=date, precompute=False, **kwargs)
+        blocks = [slice(start, min(start + self.__blocksize, self.j)) for start in range(0, self.j, self.__blocksize)]
+        blocks = [(columns, selectbaseline(baseline, columns)) for columns in blocks]
+        return dict(**baseline, hpi=economy.hpi(date), blocks=blocks, executor=None, memorys=[])
+
+    def accumulate(self, stream, *args, jacobian=False, **kwargs):
+        jacobian = jacobian or self.__solver == 'newton'
+        if 'demands' in stream.results and (not jacobian or 'offdiagonal' in stream.results): return stream.results
+        weights = np.array([household.count for household in self.__households])
+        results = dict(demands=np.zeros(self.i))
+        if jacobian: results.update(diagonal=np.zeros(self.i), offdiagonal=np.zeros((self.i, self.i)))
+        for columns, block in self.__cache['blocks']:
+            habitations = self.habitations(block['households'], stream.housings, *args, **kwargs) / self.__cache['hpi']
+            uBlock, duBlock = evaluateblock(self.__tenure, dict(block, habitations=habitations), stream.housings, slice(None), *args, **kwargs)
+            uBlock, duBlock = np.nan_to_num(uBlock), np.nan_to_num(duBlock)
+            totals = np.sum(uBlock, axis=0)
+            with np.errstate(divide='ignore'): inverses = np.where(totals > 0, 1 / totals, 0)
+            results['demands'] += uBlock @ (weights[columns] * inverses)
+            if not jacobian: continue
+            results['diagonal'] += duBlock @ (weights[columns] * inverses)
+            results['offdiagonal'] += (uBlock * (weights[columns] * inverses ** 2)) @ duBlock.transpose()
+        stream.results.update(results)
+        return stream.results
+
+    def prefilter(self, *args, economy, date, **kwargs):
+        baseline = self.basearrays(*args, economy=economy, date=date, precompute=False, **kwargs)
+        ceilings = createceilings(self.__tenure, baseline['financials'], baseline['solvent'], *args, economy=economy, date=date, **kwargs)
+        return dict(**baseline, ceilings=ceilings, hpi=economy.hpi(date), executor=None, blocks=[], memorys=[])
+
+    def basearrays(self, *args, economy, date, precompute=True, **kwargs):
+        households, housings = self.householdarrays(*args, **kwargs), self.housingarrays(*args, **kwargs)
+        financials, solvent = households['financials'].sale(*args, **kwargs)
+        baseline = dict(households=households, housings=housings, financials=financials, solvent=solvent, cpi=economy.cpi(date), prices=np.full(self.i, np.nan))
+        if precompute: baseline['habitations'] = self.habitations(households, housings, *args, **kwargs) / economy.hpi(date)
+        return baseline
+
+    def baseline(self, *args, economy, date, **kwargs):
+        baseline = self.basearrays(*args, economy=economy, date=date, **kwargs)
+        if not self.__workers or self.__workers <= 1: 
+            matrices = dict(uMatrix=np.full((self.i, self.j), np.nan, dtype=self.__dtype), duMatrix=np.full((self.i, self.j), np.nan, dtype=self.__dtype))
+            return dict(**baseline, **matrices, executor=None, blocks=[], memorys=[])
+        memorys = [SharedMemory(create=True, size=max(self.i * self.j, 1) * self.__dtype.itemsize) for matrix in ('uMatrix', 'duMatrix')]
+        uMatrix, duMatrix = [np.ndarray((self.i, self.j), dtype=self.__dtype, buffer=memory.buf) for memory in memorys]
+        uMatrix[:], duMatrix[:] = np.nan, np.nan
+        blocks = [slice(columns[0], columns[-1] + 1) for columns in np.array_split(np.arange(self.j), self.__workers) if len(columns)]
+        blocks = [(columns, selectbaseline(baseline, columns)) for columns in blocks]
+        initargs = (self.__tenure, blocks, [memory.name for memory in memorys], (self.i, self.j), self.__dtype.str, kwargs)
+        executor = self.__executor(max_workers=self.__workers, initializer=_initializeworker, initargs=initargs)
+        return dict(**baseline, uMatrix=uMatrix, duMatrix=duMatrix, executor=executor, blocks=blocks, memorys=memorys)
+
+    def __release(self):
+        cache, self.__cache = self.__cache, {}
+        if not cache: return
+        if cache['executor'] is not None: cache['executor'].shutdown(wait=True)
+        memorys = cache['memorys']
+        del cache
+        for memory in memorys: 
+            memory.unlink()
+            try: memory.close()
+            except BufferError: pass
+
+    def habitations(self, households, housings, *args, **kwargs): return createhabitations(households, housings, habitationkernel)
+
+    def householdarrays(self, *args, **kwargs):
+        utilitys = [household.utility for household in self.__households]
+        habitations = [utility.functions['habitation'] for utility in utilitys]
+        arrays = {'count':_column(self.__households, lambda household: household.count)}
+        arrays['financials'] = FinancialsArray.fromfinancials([household.financials for household in self.__households])
+        arrays.update({key:_column(utilitys, lambda utility: utility.weights[key]) for key in ('habitation', 'consumption')})
+        arrays.update({key:_column(utilitys, lambda utility: utility.coefficents[key]) for key in ('amplitude', 'diminishrate')})
+        arrays.update({'habitation_' + key:_column(habitations, lambda utility: utility.weights[key]) for key in ('location', 'quality', 'space')})
+        arrays.update({'habitation_' + key:_column(habitations, lambda utility: utility.coefficents[key]) for key in ('amplitude', 'diminishrate', 'elasticity')})
+        return arrays
+
+    def housingprices(self, *args, **kwargs): 
+        return {'price':_column(self.__housings, lambda housing: housing.purchaseprice), 'rent':_column(self.__housings, lambda housing: housing.rentercost)}
+    def housingarrays(self, *args, **kwargs):
+        arrays = {'count':_column(self.__housings, lambda housing: housing.count), 'cost':_column(self.__housings, lambda housing: housing.ownercost)}
+        arrays.update(self.housingprices(*args, **kwargs))
+        arrays.update(Housing.materialize('location', 'quality', 'space', housings=self.__housings))
+        return arrays
         
     def prices(self, *args, **kwargs): return np.array([housing.price(self.__tenure) for housing in self.__housings])
     def supplys(self, *args, **kwargs): return np.array([housing.count for housing in self.__housings])
     def demands(self, *args, uMatrix, **kwargs): 
+        if isinstance(uMatrix, UtilityStream): return self.accumulate(uMatrix, *args, **kwargs)['demands']
         weights = np.array([household.count for household in self.__households])
+        if issparse(uMatrix):
+            totals = np.asarray(uMatrix.sum(axis=0)).ravel()
+            with np.errstate(divide='ignore', invalid='ignore'): factors = np.where(totals > 0, weights / totals, 0)
+            return np.asarray(uMatrix @ factors).ravel()
         uMatrix = np.apply_along_axis(_normalize, 0, uMatrix)
         demands = np.apply_along_axis(_summation, 1, uMatrix * weights)  
         return demands
 
     def elasticitys(self, *args, uMatrix, duMatrix, **kwargs):           
-        cpMatrix = self.cpMatrix(*args, **kwargs)
-        ucMatrix = self.ucMatrix(*args, duMatrix=duMatrix, **kwargs)
-        zuMatrix = self.zuMatrix(*args, uMatrix=uMatrix, **kwargs)
-        dzMatrix = self.dzMatrix(self, *args, **kwargs)        
-        dpMatrix = dzMatrix * zuMatrix * ucMatrix * cpMatrix       
-        elasticitys = np.apply_along_axis(_summation, 0, dpMatrix)
-        elasticitys = np.apply_along_axis(_summation, 0, dpMatrix)          
+        if isinstance(uMatrix, UtilityStream): 
+            results = self.accumulate(uMatrix, *args, jacobian=True, **kwargs)
+            diagonal, offdiagonal = results['diagonal'], results['offdiagonal']
+        else: diagonal, offdiagonal = self.contractions(uMatrix, duMatrix)
+        elasticitys = (np.diag(diagonal) - offdiagonal) * self.cpFactor(*args, **kwargs)
+        assert elasticitys.shape == (self.i, self.k)
         return elasticitys
 
-    def cpMatrix(self, *args, economy, date, **kwargs):
-        cpi = np.prod(np.array([1+economy.inflationrate(i, units='year') for i in range(economy.date.year, date.year)]))        
-        cpMatrix = np.ones(self.shape) * cpi
-        assert cpMatrix.shape == self.shape
-        return cpMatrix
-
-    def ucMatrix(self, *args, duMatrix, **kwargs):
-        ucMatrix = np.broadcast_to(np.expand_dims(duMatrix.transpose(), axis=2), self.shape)
-        assert ucMatrix.shape == self.shape
-        return ucMatrix
-
-    def zuMatrix(self, *args, uMatrix, **kwargs):
-        eye = np.broadcast_to(np.expand_dims(np.eye(self.i), axis=0), self.shape)
-        zero = np.where(eye == 1, 0, 1)
-        iij = np.broadcast_to(np.expand_dims(uMatrix.transpose(), axis=2), self.shape)
-        off = (iij * eye) - iij
-        on = np.broadcast_to(np.expand_dims(np.apply_along_axis(_summation, 2, iij * zero), axis=2), self.shape) * eye
-        zuMatrix = np.apply_along_axis(_divide, 0, off + on, np.apply_along_axis(_summation, 0, uMatrix) ** 2)
-        assert zuMatrix.shape == self.shape
-        return zuMatrix
-    
-    def dzMatrix(self, *args, **kwargs):
+    def contractions(self, uMatrix, duMatrix):
         weights = np.array([household.count for household in self.__households])
-        dzMatrix = np.apply_along_axis(_multiply, 0, np.ones(self.shape), weights)
-        assert dzMatrix.shape == self.shape
-        return dzMatrix
-                
-
-       
+        if not issparse(uMatrix): uMatrix, duMatrix = np.nan_to_num(uMatrix), np.nan_to_num(duMatrix)
+        totals = np.asarray(uMatrix.sum(axis=0)).ravel()
+        with np.errstate(divide='ignore'): inverses = np.where(totals > 0, 1 / totals, 0)
+        diagonal = np.asarray(duMatrix @ (weights * inverses)).ravel()
+        if issparse(uMatrix): offdiagonal = (uMatrix.multiply((weights * inverses ** 2)[np.newaxis, :]).tocsr() @ duMatrix.transpose()).toarray()
+        else: offdiagonal = (uMatrix * (weights * inverses ** 2)) @ duMatrix.transpose()
+        return diagonal, offdiagonal
 
+    @keydispatcher
+    def consumptionprice(self, tenure, *args, **kwargs): raise KeyError(tenure)
+    @consumptionprice.register('renter')
+    def consumptionprice_renter(self, *args, **kwargs): return -1
+    @consumptionprice.register('owner')
+    def consumptionprice_owner(self, *args, bank, **kwargs): return -float(bank.loantovalue * paymentvalue(1, bank.rate, bank.duration))
 
-        
-        
-        
-        
\ No newline at end of file
+    def cpFactor(self, *args, economy, date, **kwargs): return self.consumptionprice(self.__tenure, *args, **kwargs) / economy.cpi(date)
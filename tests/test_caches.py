@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+@name:   Real Estate Cache Tests
+@author: Jack Kirby Cook
+
+"""
+
+import pytest
+import datetime
+import numpy as np
+from collections import namedtuple as ntuple
+
+from realestate.caches import InstanceKey, InstanceCache, ColumnTable
+
+
+class ItemTable(ColumnTable, dtypes={'count':'int64', 'price':'float64', 'name':'object'}): pass
+
+
+class Item(ntuple('Item', 'name')):
+    def __new__(cls, name, *args, cache, count=1, **kwargs):
+        key = InstanceKey((name,))
+        try: instance = cache[key]
+        except KeyError:
+            instance = super().__new__(cls, name)
+            instance.row = cache.restore(key, name=name)
+            cache[key] = instance
+        cache.table.add(instance.row, 'count', count)
+        instance.table = cache.table
+        return instance
+
+    @property
+    def count(self): return int(self.table.get(self.row, 'count'))
+
+
+def test_declared_columns():
+    table = ItemTable()
+    assert table.columns == ['count', 'price', 'name']
+    row = table.append(count=2, name='a')
+    table.set(row, 'price', 10)
+    assert table.get(row, 'price') == 10
+    assert np.isnan(table.get(table.append(name='b'), 'price'))
+
+
+def test_tuple_instances():
+    cache = InstanceCache(maxsize=2, table=ItemTable)
+    items = [Item(name, cache=cache) for name in ('a', 'b', 'a', 'c')]
+    assert items[0] is items[2] and items[0].count == 2
+    assert len(cache) == 2 and len(cache.table) == 2
+
+
+def test_evicted_rows():
+    cache = InstanceCache(maxsize=2, table=ItemTable)
+    a, b = Item('a', cache=cache, count=3), Item('b', cache=cache)
+    c = Item('c', cache=cache)
+    assert not cache.table.active[a.row] and cache.statistics['untabled'] == 3
+    d = Item('d', cache=cache)
+    assert len({a.row, b.row, c.row, d.row}) == 4
+    assert a.count == 3 and b.count == 1
+    restored = Item('a', cache=cache)
+    assert restored is not a and restored.row == a.row
+    assert restored.count == 4 and cache.table.active[a.row]
+    assert cache.statistics['untabled'] == 2
+
+
+def test_forfeited_rows():
+    cache = InstanceCache(maxsize=1, ledgersize=1, table=ItemTable)
+    a, b, c = [Item(name, cache=cache) for name in ('a', 'b', 'c')]
+    assert cache.statistics['forfeited'] == 1
+    d = Item('d', cache=cache)
+    assert len({a.row, b.row, c.row, d.row}) == 4
+    assert Item('a', cache=cache).count == 1
+    cache.clear()
+    assert len(cache.table) == 0 and Item('a', cache=cache).row == 0
+
+
+class Geography(ntuple('Geography', 'geoID')): pass
+
+
+def test_housing():
+    housing = pytest.importorskip('realestate.housing')
+    economy = pytest.importorskip('realestate.economy')
+    rate = economy.Rate(np.array([2000, 2050]), np.array([0.02, 0.03]), basis='year')
+    with housing.Housing.scope(maxsize=2):
+        date, parameters = datetime.date(2020, 1, 1), {'bedrooms':3}
+        instances = [housing.Housing(date=date, geography=Geography(str(index)), parameters=parameters, concepts={}, price=200000 + index, rent=1500 + index, cost=300, rentrate=rate, valuerate=rate) for index in range(4)]
+        instances[-1](1800, tenure='renter')
+        assert [instance.rentercost for instance in instances] == [1500, 1501, 1502, 1800]
+        assert instances[0].purchaseprice == 200000 and instances[0].count == 1
+        assert housing.Housing.statistics()['evictions'] == 2
+        assert len(housing.Housing.table()) == 2
+
+
+def test_household():
+    households = pytest.importorskip('realestate.households')
+    finance = pytest.importorskip('realestate.finance')
+    utility = pytest.importorskip('realestate.utility')
+    rates = dict(discountrate=0.002, risktolerance=1, wealthrate=0.003, incomerate=0.002)
+    function = utility.Household_UtilityFunction.create(housing_expense_ratio=0.3, elasticity_substitution=2, housing_index_ratios={'location':0.4, 'quality':0.3, 'space':0.3})
+    with households.Household.scope(maxsize=2):
+        date = datetime.date(2020, 1, 1)
+        financials = [finance.Financials(360, 720, income=5000 + index, wealth=50000, value=0, consumption=4000, **rates) for index in range(3)]
+        instances = [households.Household(date=date, age=35, parameters={}, financials=financial, utility=function) for financial in financials]
+        assert households.Household(date=date, age=35, parameters={}, financials=financials[-1], utility=function) is instances[-1]
+        assert instances[-1].count == 2 and instances[0].count == 1
+        assert len(households.Household.table()) == 2
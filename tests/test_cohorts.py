@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+@name:   Real Estate Cohort Tests
+@author: Jack Kirby Cook
+
+"""
+
+import pytest
+import datetime
+import numpy as np
+from collections import namedtuple as ntuple
+
+cohorts = pytest.importorskip('realestate.cohorts')
+from realestate.economy import Rate
+from realestate.finance import Financials
+from realestate.households import Household
+from realestate.housing import Housing
+from realestate.utility import Household_UtilityFunction
+
+
+DATE = datetime.date(2020, 1, 1)
+RATE = Rate(np.array([2000, 2050]), np.array([0.02, 0.02]), basis='year')
+
+
+class Geography(ntuple('Geography', 'geoID')): pass
+
+
+def households(generator, size):
+    instances = []
+    for index in range(size):
+        age, income = int(generator.integers(25, 45)), int(generator.uniform(3000, 12000))
+        utility = Household_UtilityFunction.create(housing_expense_ratio=float(generator.uniform(0.2, 0.4)), elasticity_substitution=2, housing_index_ratios={'location':0.4, 'quality':0.3, 'space':0.3})
+        financials = Financials((65 - age) * 12, (95 - age) * 12, income=income, wealth=int(generator.uniform(0, 100000)), value=0, consumption=int(income * 0.5), discountrate=0.002, risktolerance=1, wealthrate=0.003, incomerate=0.002)
+        instances.append(Household(date=DATE, age=age, parameters={}, financials=financials, utility=utility))
+    return instances
+
+
+def housings(generator, size):
+    concepts = lambda: {key:float(generator.uniform(1, 10)) for key in ('location', 'quality', 'space')}
+    return [Housing(date=DATE, geography=Geography(str(index % 3)), parameters=concepts(), concepts={}, price=float(generator.uniform(2e5, 6e5)), rent=float(generator.uniform(1000, 3000)), cost=300, rentrate=RATE, valuerate=RATE) for index in range(size)]
+
+
+def test_household_cohorts():
+    with Household.scope():
+        items = households(np.random.default_rng(0), 400)
+        builder = cohorts.Household_Cohorts()
+        result = builder(items)
+        assert result.cohorts <= 4 * 3 * 3 and result.reduction >= 5
+        assert set(result.errors.keys()) == set(builder.features(items).keys())
+        assert sum([item.count for item in result.representatives]) == sum([item.count for item in items])
+        assert cohorts.Household_Cohorts(bins=10, maxcohorts=20)(items).cohorts <= 20
+
+
+def test_housing_cohorts():
+    with Housing.scope():
+        items = housings(np.random.default_rng(0), 300)
+        builder = cohorts.Housing_Cohorts()
+        result = builder(items)
+        assert result.cohorts <= 4 * 4 * 3 and result.reduction >= 5
+        assert set(result.errors.keys()) == set(builder.features(items).keys())
+        assert all([np.isfinite(error) for error in result.errors.values()])
+        assert cohorts.Housing_Cohorts(bins={'rent':50}, maxcohorts=30)(items).cohorts <= 30
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+@name:   Real Estate Economy Tests
+@author: Jack Kirby Cook
+
+"""
+
+import pytest
+import datetime
+import numpy as np
+
+economy = pytest.importorskip('realestate.economy')
+
+
+def create(date):
+    rate = economy.Rate(np.array([2000, 2050]), np.array([0.02, 0.03]), basis='year')
+    return economy.Economy(date, rate, rate, rate, rate, None, None)
+
+
+def test_deflators():
+    instance = create(datetime.date(2020, 1, 1))
+    rates = instance.inflationrate(np.arange(2020, 2025), units='year')
+    assert instance.cpi(datetime.date(2020, 6, 1)) == 1
+    assert np.isclose(instance.cpi(datetime.date(2025, 1, 1)), np.prod(1 + rates))
+    assert np.isclose(instance.hpi(datetime.date(2060, 1, 1)), instance.cpi(datetime.date(2060, 1, 1)))
+
+
+def test_replaced_deflators():
+    instance = create(datetime.date(2020, 1, 1))
+    instance.cpi(datetime.date(2025, 1, 1))
+    replaced = instance._replace(date=datetime.date(2022, 1, 1))
+    assert np.isclose(replaced.cpi(datetime.date(2025, 1, 1)), create(datetime.date(2022, 1, 1)).cpi(datetime.date(2025, 1, 1)))
+    assert np.isclose(economy.Economy._make(instance).cpi(datetime.date(2025, 1, 1)), instance.cpi(datetime.date(2025, 1, 1)))
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+@name:   Real Estate Feed Tests
+@author: Jack Kirby Cook
+
+"""
+
+import pytest
+import numpy as np
+
+feed = pytest.importorskip('realestate.feed')
+
+
+class Variable(object):
+    def __init__(self, values): self.values = values
+    def fromindex(self, index): return self.values[int(index)]
+
+
+class Histogram(object):
+    def __init__(self, axiskey, values): self.axiskey, self.axisvariable = axiskey, Variable(values)
+
+
+def sampler(histogram, size, generator): return generator.integers(0, len(histogram.axisvariable.values), size)
+
+
+def create(values): return feed.MonteCarlo(seed=1, sampler=sampler, variable=Histogram('variable', values))
+
+
+@pytest.mark.parametrize('values', [[(0, 9), (10, 19), (20, 29)], ['a', 'b', 'c'], [(0, 9), 'a', None], [1.5, 2.5, 3.5]])
+def test_fromindex_values(values):
+    expected = [values[int(index)] for index in create(values).samplematrix(20)[0]]
+    samples = [sample['variable'] for index, sample in create(values)(20)]
+    assert samples == expected
+    assert all([type(sample) is type(value) for sample, value in zip(samples, expected) if not isinstance(value, float)])
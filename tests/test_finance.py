@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+@name:   Real Estate Finance Tests
+@author: Jack Kirby Cook
+
+"""
+
+import pytest
+import numpy as np
+
+finance = pytest.importorskip('realestate.finance')
+economy = pytest.importorskip('realestate.economy')
+
+
+imatrix = lambda n: np.triu(-np.subtract(*np.mgrid[0:n, 0:n]))
+rmatrix = lambda r, n: np.ones((n, n)) * (1 + r)
+fmatrix = lambda r, n: np.triu(rmatrix(r, n) ** imatrix(n))
+investarray = lambda xn, r: np.sum(fmatrix(r, len(xn)) * np.expand_dims(xn, 1), axis=0)
+
+fv = lambda r, n, pmt, pv: -pv * (1 + r) ** n - pmt * (n if r == 0 else ((1 + r) ** n - 1) / r)
+pmt = lambda r, n, pv: 0 if n == 0 else -pv / n if r == 0 else -pv * r / (1 - (1 + r) ** -n)
+
+iarray = lambda n: np.arange(n + 1)
+flowarray = lambda x, r, n: fv(r, iarray(n), 0, -x)
+loanarray = lambda x, r, n: fv(r, iarray(n), -pmt(r, n, x), -x)
+payarray = lambda x, r, n: np.concatenate([np.array([0]), -np.ones(n) * pmt(r, n, x)])
+padarrays = lambda *xns: [np.pad(xn, (0, max([len(xn) for xn in xns]) - len(xn)), mode='constant') for xn in xns]
+
+RATES = [0, 0.003, 0.01, -0.002]
+LOANS = [(250000, 0.004, 360), (40000, 0, 120), (10000, 0.015, 36), (0, 0.01, 0)]
+HORIZONS = [(0, 0), (24, 60), (60, 60), (120, 480), (480, 480)]
+
+
+def reference(horizon, wealth, income, consumption, *args, incomehorizon, consumptionhorizon, wealthrate, incomerate, consumptionrate, loans=[], **kwargs):
+    incomes = flowarray(income, incomerate, incomehorizon)
+    consumptions = flowarray(consumption, consumptionrate, consumptionhorizon)
+    payments = [payarray(balance, rate, duration) for balance, rate, duration in loans]
+    incomes, consumptions, *payments = padarrays(incomes, consumptions, *payments)
+    savings = incomes - consumptions - sum(payments, np.zeros(len(incomes)))
+    cashflows = np.concatenate([np.array([wealth]), savings])
+    return investarray(cashflows, wealthrate)[horizon]
+
+
+@pytest.mark.parametrize('rate', RATES)
+@pytest.mark.parametrize('size', [1, 2, 13, 120])
+def test_investarray(rate, size):
+    cashflows = np.random.default_rng(size).normal(1000, 500, size)
+    assert np.allclose(finance.investarray(cashflows, rate), investarray(cashflows, rate), rtol=1e-10, atol=1e-6)
+
+
+@pytest.mark.parametrize('balance, rate, duration', LOANS)
+def test_loanschedule(balance, rate, duration):
+    assert np.isclose(economy.paymentvalue(balance, rate, duration), -pmt(rate, duration, balance), rtol=1e-10, atol=1e-6)
+    if not duration: return
+    assert np.allclose(economy.balancevalue(balance, rate, duration, iarray(duration)), loanarray(balance, rate, duration), rtol=1e-10, atol=1e-4)
+    assert np.isclose(economy.balancevalue(balance, rate, duration, duration * 2), 0, atol=1e-4)
+
+
+@pytest.mark.parametrize('wealthrate', RATES)
+@pytest.mark.parametrize('incomerate, consumptionrate', [(0, 0), (0.002, 0.001), (0.004, -0.001)])
+@pytest.mark.parametrize('incomehorizon, consumptionhorizon', HORIZONS)
+def test_wealthvalue(wealthrate, incomerate, consumptionrate, incomehorizon, consumptionhorizon):
+    rates = dict(wealthrate=wealthrate, incomerate=incomerate, consumptionrate=consumptionrate)
+    horizons = dict(incomehorizon=incomehorizon, consumptionhorizon=consumptionhorizon)
+    payments = [(economy.paymentvalue(balance, rate, duration), duration) for balance, rate, duration in LOANS]
+    for horizon in sorted({0, 1, 12, 36, 120, 360, 361, consumptionhorizon}):
+        if horizon > consumptionhorizon: continue
+        expected = reference(horizon, 50000, 6000, 4000, **horizons, **rates, loans=LOANS)
+        actual = finance.wealthvalue(horizon, 50000, 6000, 4000, **horizons, **rates, payments=payments)
+        assert np.isclose(actual, expected, rtol=1e-9, atol=1e-4), (horizon, actual, expected)
+
+
+@pytest.mark.parametrize('wealthrate', RATES)
+@pytest.mark.parametrize('incomehorizon, consumptionhorizon', HORIZONS)
+def test_terminalwealth(wealthrate, incomehorizon, consumptionhorizon):
+    rates = dict(wealthrate=wealthrate, incomerate=0.002, consumptionrate=0.001)
+    horizons = dict(incomehorizon=incomehorizon, consumptionhorizon=consumptionhorizon)
+    payments = [(economy.paymentvalue(balance, rate, duration), duration) for balance, rate, duration in LOANS]
+    expected = reference(consumptionhorizon, 50000, 6000, 4000, **horizons, **rates, loans=LOANS)
+    actual = finance.terminalwealth(50000, 6000, 4000, **horizons, **rates, payments=payments)
+    assert np.isclose(actual, expected, rtol=1e-9, atol=1e-4)
+
+
+def test_wealthvalue_vectorized():
+    rates = dict(wealthrate=np.array([0, 0.003, 0.01]), incomerate=np.array([0.002, 0, 0.001]), consumptionrate=np.array([0, 0.001, -0.001]))
+    horizons = dict(incomehorizon=np.array([24, 120, 480]), consumptionhorizon=np.array([60, 480, 480]))
+    payments = [(economy.paymentvalue(balance, rate, duration), duration) for balance, rate, duration in LOANS]
+    actual = finance.terminalwealth(50000, 6000, 4000, **horizons, **rates, payments=payments)
+    for index, value in enumerate(actual):
+        scalars = {key:values[index] for key, values in {**rates, **horizons}.items()}
+        assert np.isclose(value, reference(scalars['consumptionhorizon'], 50000, 6000, 4000, **scalars, loans=LOANS), rtol=1e-9, atol=1e-4)
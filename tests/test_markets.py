@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+@name:   Real Estate Market Tests
+@author: Jack Kirby Cook
+
+"""
+
+import pytest
+import datetime
+import numpy as np
+from collections import namedtuple as ntuple
+
+markets = pytest.importorskip('realestate.markets')
+from realestate.economy import Economy, Rate, Broker
+from realestate.finance import Financials
+from realestate.households import Household
+from realestate.housing import Housing
+from realestate.utility import Household_UtilityFunction
+
+
+_norm = lambda x: float(np.linalg.norm(np.nan_to_num(x)))
+
+DATE = datetime.date(2020, 1, 1)
+RATE = Rate(np.array([2000, 2050]), np.array([0.02, 0.02]), basis='year')
+ECONOMY = Economy(DATE, RATE, RATE, RATE, RATE, None, None)
+ARGUMENTS = dict(economy=ECONOMY, date=DATE, broker=Broker(0.03), wealthrate=0.003, incomerate=0.002)
+MARKETS = [dict(seed=0, rents=(1500, 1500), incomes=(3000, 12000)), dict(seed=0, rents=(100, 6000), incomes=(1500, 6000)), dict(seed=3, rents=(3000, 3000), incomes=(2000, 9000))]
+
+
+class Geography(ntuple('Geography', 'geoID')): pass
+class History(object):
+    def __init__(self): self.data = []
+    def __call__(self, prices): self.data.append(np.array(prices, dtype='float64'))
+class Dampener(object):
+    def __call__(self, data): return 1
+class Converger(object):
+    def __init__(self, tolerance): self.tolerance, self.residual, self.value = tolerance, None, None
+    def __bool__(self): return self.residual is not None and self.residual <= self.tolerance
+    def __call__(self, excess, data): self.residual, self.value = _norm(excess), data[-1]
+
+
+def housings(generator, size, supply, rents):
+    counts = np.diff(np.round(np.linspace(0, supply, size + 1))).astype(int)
+    concepts = lambda: {key:float(generator.uniform(1, 10)) for key in ('location', 'quality', 'space')}
+    return [Housing(date=DATE, geography=Geography(str(index)), parameters=concepts(), concepts={}, price=300000, rent=float(generator.uniform(*rents)), cost=300, rentrate=RATE, valuerate=RATE, count=int(count)) for index, count in enumerate(counts)]
+
+
+def households(generator, size, incomes):
+    instances = []
+    for index in range(size):
+        utility = Household_UtilityFunction.create(housing_expense_ratio=float(generator.uniform(0.2, 0.4)), elasticity_substitution=2, housing_index_ratios={'location':0.4, 'quality':0.3, 'space':0.3})
+        income = int(generator.uniform(*incomes))
+        financials = Financials(360, 720, income=income, wealth=int(generator.uniform(0, 100000)), value=0, consumption=int(income * 0.6), discountrate=0.002, risktolerance=1, wealthrate=0.003, incomerate=0.002)
+        instances.append(Household(date=DATE, age=35, parameters={}, financials=financials, utility=utility))
+    return instances
+
+
+def create(generator, rents, incomes, *args, tolerance=0.1, **kwargs):
+    supplys, demands = housings(generator, 10, 60, rents), households(generator, 60, incomes)
+    return markets.Personal_Property_Market('renter', households=demands, housings=supplys, history=History(), dampener=Dampener(), converger=Converger(tolerance), **kwargs, **ARGUMENTS)
+
+
+def solve(solver, *args, seed, rents, incomes, maxsteps=300, **kwargs):
+    with Household.scope(), Housing.scope():
+        market = create(np.random.default_rng(seed), rents, incomes, solver=solver, maxsteps=maxsteps)
+        market(**ARGUMENTS)
+        supplys, demands, prices = market.execute(**ARGUMENTS)
+        return market.iterations, _norm(demands - supplys), prices
+
+
+@pytest.mark.parametrize('solver', ['newton', 'broyden'])
+@pytest.mark.parametrize('configuration', MARKETS)
+def test_newton_convergence(solver, configuration):
+    steps, residual, prices = solve('tatonnement', **configuration)
+    assert steps < 300 and residual <= 0.1
+    newtonsteps, newtonresidual, newtonprices = solve(solver, **configuration)
+    assert newtonsteps <= steps and newtonresidual <= 0.1
+    assert np.all(np.isfinite(newtonprices)) and np.all(newtonprices > 0)
+
+
+@pytest.mark.parametrize('configuration', MARKETS)
+def test_sparse_evaluation(configuration):
+    demands = {}
+    for evaluation in ('vectorized', 'sparse'):
+        with Household.scope(), Housing.scope():
+            market = create(np.random.default_rng(configuration['seed']), configuration['rents'], configuration['incomes'], evaluation=evaluation)
+            uMatrix, duMatrix = market.evaluate(**ARGUMENTS)
+            demands[evaluation] = market.demands(uMatrix=uMatrix, **ARGUMENTS), market.elasticitys(uMatrix=uMatrix, duMatrix=duMatrix, **ARGUMENTS)
+    assert np.allclose(demands['sparse'][0], demands['vectorized'][0], rtol=1e-9)
+    assert np.allclose(demands['sparse'][1], demands['vectorized'][1], rtol=1e-9)
+
+
+@pytest.mark.parametrize('configuration', MARKETS[:2])
+def test_multigrid(configuration):
+    steps, residual, prices = solve('tatonnement', **configuration)
+    components = lambda level: dict(history=History(), dampener=Dampener(), converger=Converger(1))
+    with Household.scope(), Housing.scope():
+        market = create(np.random.default_rng(configuration['seed']), configuration['rents'], configuration['incomes'], solver='multigrid', multigrid=[None], components=components, levelsteps=30, maxsteps=300)
+        market(**ARGUMENTS)
+        supplys, demands, prices = market.execute(**ARGUMENTS)
+    level, = market.levels
+    assert level['reduction'] >= 2 and level['housings'] * level['households'] * level['reduction'] == pytest.approx(market.i * market.j)
+    assert level['steps'] <= 30 and market.iterations + level['steps'] / level['reduction'] < steps
+    assert _norm(demands - supplys) <= 0.1
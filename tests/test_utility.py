@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+@name:   Real Estate Utility Tests
+@author: Jack Kirby Cook
+
+"""
+
+import math
+import pytest
+import numpy as np
+
+utility = pytest.importorskip('realestate.utility')
+
+
+KEYS = ('location', 'quality', 'space')
+
+
+def ces(concepts, weights, amplitude, diminishrate, elasticity):
+    if any(math.isnan(concepts[key]) for key in KEYS): return math.nan
+    return amplitude * math.pow(math.fsum([weights[key] * math.pow(concepts[key], elasticity) for key in KEYS]), diminishrate / elasticity)
+
+
+def cobbdouglas(habitation, consumption, weights, amplitude, diminishrate):
+    if not (habitation > 0 and consumption > 0): return math.nan, math.nan
+    value = amplitude * math.pow(math.pow(habitation, weights['habitation']) * math.pow(consumption, weights['consumption']), diminishrate)
+    return value, value * diminishrate * weights['consumption'] / consumption
+
+
+def households(size, seed):
+    generator = np.random.default_rng(seed)
+    weights = {key:generator.uniform(0.1, 1, size) for key in KEYS}
+    weights = {key:values / sum(weights.values()) for key, values in weights.items()}
+    amplitude, diminishrate = generator.uniform(0.5, 2, size), generator.uniform(0.3, 1, size)
+    elasticity = 1 - 1 / generator.choice([0.5, 0.8, 1.5, 4], size)
+    return weights, amplitude, diminishrate, elasticity
+
+
+@pytest.mark.parametrize('scale', [1, 1e100, 1e-100, 1e250])
+@pytest.mark.parametrize('size', [(1, 1), (3, 4), (5, 2)])
+def test_habitationkernel(size, scale):
+    rows, cols = size
+    concepts = {key:np.random.default_rng(rows).uniform(1, 100, rows) * scale for key in KEYS}
+    concepts['space'][0] = np.nan
+    weights, amplitude, diminishrate, elasticity = households(cols, cols)
+    expected = np.array([[ces({key:concepts[key][i] for key in KEYS}, {key:weights[key][j] for key in KEYS}, amplitude[j], diminishrate[j], elasticity[j]) for j in range(cols)] for i in range(rows)])
+    actual = utility.habitationkernel(concepts, weights, amplitude, diminishrate, elasticity)
+    assert actual.shape == (rows, cols)
+    assert np.array_equal(np.isnan(actual), np.isnan(expected))
+    assert np.allclose(actual, expected, rtol=1e-9, atol=0, equal_nan=True)
+
+
+@pytest.mark.parametrize('scale', [1, 1e100, 1e-100])
+@pytest.mark.parametrize('size', [(1, 1), (3, 4), (5, 2)])
+def test_householdkernel(size, scale):
+    rows, cols = size
+    generator = np.random.default_rng(rows * cols)
+    habitations, consumptions = generator.uniform(1, 100, size) * scale, generator.uniform(-20, 100, size) * scale
+    habitations[0, 0], consumptions[-1, -1] = np.nan, 0
+    weights = {'habitation':generator.uniform(0.1, 0.5, cols)}
+    weights['consumption'] = 1 - weights['habitation']
+    amplitude, diminishrate = generator.uniform(0.5, 2, cols), generator.uniform(0.3, 1, cols)
+    expected = [[cobbdouglas(habitations[i, j], consumptions[i, j], {key:values[j] for key, values in weights.items()}, amplitude[j], diminishrate[j]) for j in range(cols)] for i in range(rows)]
+    expected = np.array(expected)
+    uMatrix, duMatrix = utility.householdkernel(habitations, consumptions, weights, amplitude, diminishrate)
+    assert uMatrix.shape == duMatrix.shape == (rows, cols)
+    assert np.array_equal(np.isnan(uMatrix), np.isnan(expected[..., 0])) and np.array_equal(np.isnan(duMatrix), np.isnan(expected[..., 1]))
+    assert np.allclose(uMatrix, expected[..., 0], rtol=1e-9, atol=0, equal_nan=True)
+    assert np.allclose(duMatrix, expected[..., 1], rtol=1e-9, atol=0, equal_nan=True)
+
+
+@pytest.mark.parametrize('size', [(1, 1), (3, 4), (5, 2)])
+def test_habitationpairs(size):
+    rows, cols = size
+    concepts = {key:np.random.default_rng(rows).uniform(1, 100, rows) for key in KEYS}
+    concepts['space'][0] = np.nan
+    weights, amplitude, diminishrate, elasticity = households(cols, cols)
+    expected = utility.habitationkernel(concepts, weights, amplitude, diminishrate, elasticity)
+    i, j = [np.ravel(index) for index in np.indices(size)]
+    actual = utility.habitationpairs({key:values[i] for key, values in concepts.items()}, {key:values[j] for key, values in weights.items()}, amplitude[j], diminishrate[j], elasticity[j])
+    assert np.allclose(actual, expected[i, j], rtol=1e-12, atol=0, equal_nan=True)
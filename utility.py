@@ -13,7 +13,7 @@ from utilities.utility import UtilityIndex, UtilityFunction
 
 __version__ = "1.0.0"
 __author__ = "Jack Kirby Cook"
-__all__ = ['Habitation_UtilityFunction', 'Household_UtilityFunction']
+__all__ = ['Habitation_UtilityFunction', 'Household_UtilityFunction', 'habitationkernel', 'habitationpairs', 'householdkernel']
 __copyright__ = "Copyright 2020, Jack Kirby Cook"
 __license__ = ""
 
@@ -23,6 +23,42 @@ _aslist = lambda items: [items] if not isinstance(items, (list, tuple)) else lis
 _filterempty = lambda items: [item for item in _aslist(items) if item]
 _inverse = lambda items: np.array(items).astype('float64')**-1
 _normalize = lambda items: np.array(items) / np.sum(np.array(items))
+_rows = lambda x: np.asarray(x, dtype='float64')[:, np.newaxis]
+_cols = lambda x: np.asarray(x, dtype='float64')[np.newaxis, :]
+_pairs = lambda x: np.asarray(x, dtype='float64')
+
+
+def _logsumexp(terms):
+    peak = np.max(terms, axis=0)
+    peak = np.where(np.isfinite(peak), peak, 0)
+    return peak + np.log(np.sum(np.exp(terms - peak), axis=0))
+
+
+def _habitation(concepts, weights, amplitude, diminishrate, elasticity):
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        terms = np.stack([np.log(weights[key]) + elasticity * np.log(concepts[key]) for key in concepts.keys()])
+        return np.exp(np.log(amplitude) + diminishrate / elasticity * _logsumexp(terms))
+
+
+def habitationkernel(concepts, weights, amplitude, diminishrate, elasticity):
+    concepts, weights = {key:_rows(values) for key, values in concepts.items()}, {key:_cols(values) for key, values in weights.items()}
+    return _habitation(concepts, weights, _cols(amplitude), _cols(diminishrate), _cols(elasticity))
+
+
+def habitationpairs(concepts, weights, amplitude, diminishrate, elasticity):
+    concepts, weights = {key:_pairs(values) for key, values in concepts.items()}, {key:_pairs(values) for key, values in weights.items()}
+    return _habitation(concepts, weights, _pairs(amplitude), _pairs(diminishrate), _pairs(elasticity))
+
+
+def householdkernel(habitations, consumptions, weights, amplitude, diminishrate):
+    feasible = (habitations > 0) & (consumptions > 0)
+    habitations, consumptions = np.where(feasible, habitations, 1), np.where(feasible, consumptions, 1)
+    amplitude, diminishrate = _cols(amplitude), _cols(diminishrate)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        logutility = np.log(amplitude) + diminishrate * (_cols(weights['habitation']) * np.log(habitations) + _cols(weights['consumption']) * np.log(consumptions))
+        uMatrix = np.exp(logutility)
+        duMatrix = np.exp(logutility + np.log(diminishrate * _cols(weights['consumption'])) - np.log(consumptions))
+    return np.where(feasible, uMatrix, np.nan), np.where(feasible, duMatrix, np.nan)
 
 
 class Habitation_UtilityFunction(UtilityFunction, functionname='habitation', functiontype='ces', 
@@ -43,16 +79,14 @@ class Household_UtilityFunction(UtilityFunction, functionname='household', funct
                                 parameters=('habitation', 'consumption',), coefficents=('amplitude', 'diminishrate',)):
     @classmethod
     def create(cls, *args, housing_expense_ratio, **kwargs): 
-        functions = {'habitabtion':Habitation_UtilityFunction.create(*args, **kwargs)}
+        functions = {'habitation':Habitation_UtilityFunction.create(*args, **kwargs)}
         weights = {'habitation':housing_expense_ratio, 'consumption':1 - housing_expense_ratio}
         coefficents = {'amplitude':1, 'diminishrate':1}
         return cls(*args, subsistences={}, weights=weights, functions=functions, **coefficents, **kwargs)  
     
     def execute(self, *args, spending, habitation, economy, date, **kwargs):
-        cpi = np.prod(np.array([1+economy.inflationrate(i, units='year') for i in range(economy.date.year, date.year)]))
-        consumption = (spending / cpi)
-        hpi = np.prod(np.array([1+economy.depreciationrate(i, units='year') for i in range(economy.date.year, date.year)]))
-        habitation = (habitation / hpi)
+        consumption = (spending / economy.cpi(date))
+        habitation = (habitation / economy.hpi(date))
         return {'habitation':habitation, 'consumption':consumption}
 
 